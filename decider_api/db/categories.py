@@ -1,4 +1,5 @@
 from django.db import connection
+from decider_api.db.rows import fetch_dicts
 
 QUERY = """ SELECT d_locale_category.category_id as id, d_locale_category.name as name
             FROM d_locale_category"""
@@ -10,8 +11,7 @@ def get_categories(locale_id):
     where = " WHERE locale_id = %s" % locale_id
     query = QUERY + where
     cursor.execute(query)
-    c_list = cursor.fetchall()
-    columns = [i[0] for i in cursor.description]
+    c_list = fetch_dicts(cursor)
     cursor.close()
 
-    return c_list, columns
\ No newline at end of file
+    return c_list
\ No newline at end of file
@@ -1,35 +1,51 @@
 from django.db import connection
+from decider_api.db.rows import fetch_dicts
 
 SELECT_QUERY = """ SELECT d_comment.id, d_comment.text, d_comment.creation_date, d_comment.likes_count,
                           d_comment.is_anonymous, d_comment.question_id,
                           author_user.first_name as author_first_name, author_user.last_name as author_last_name,
                           author_user.middle_name as author_middle_name, author_user.username as author_username,
                           author_picture.url as author_image_url, author_user.id as author_id,
-                          author_user.uid as author_uid, author_user.is_anonymous as author_anonymous,
-                          d_comment_likes.id as voted
+                          author_user.uid as author_uid, author_user.is_anonymous as author_anonymous
                    FROM d_comment
                    LEFT JOIN d_user as author_user ON d_comment.author_id = author_user.id
                    LEFT JOIN d_picture as author_picture ON author_picture.id = author_user.avatar_id
-                   LEFT JOIN d_comment_likes ON d_comment_likes.user_id = {0}
-                         AND d_comment_likes.comment_id = d_comment.id
-                   WHERE d_comment.question_id = {1} AND d_comment.is_active=TRUE"""
+                   WHERE d_comment.question_id = {0} AND d_comment.is_active=TRUE"""
 
+# order -> (ORDER BY, keyset condition continuing after a (creation_date, id) pair)
+ORDERS = {
+    'asc': ("d_comment.creation_date ASC, d_comment.id ASC",
+            " AND (d_comment.creation_date, d_comment.id) > (%s, %s)"),
+    'desc': ("d_comment.creation_date DESC, d_comment.id DESC",
+             " AND (d_comment.creation_date, d_comment.id) < (%s, %s)"),
+    'id_asc': ("d_comment.id ASC", None),
+    'id_desc': ("d_comment.id DESC", None)
+}
 
-def get_comments(user_id, q_id, order=None, limit=None, offset=None):
+
+def get_comments(q_id, order=None, limit=None, offset=None, after=None, since_id=None, before_id=None):
     cursor = connection.cursor()
 
-    query = SELECT_QUERY.format(user_id, q_id)
+    query = SELECT_QUERY.format(int(q_id))
+    params = []
+
+    if since_id is not None:
+        query += " AND d_comment.id > {0}".format(int(since_id))
+    if before_id is not None:
+        query += " AND d_comment.id < {0}".format(int(before_id))
 
+    if after is not None:
+        query += ORDERS[order][1]
+        params.extend(after)
     if order:
-        query += " ORDER BY {0}".format(order)
+        query += " ORDER BY {0}".format(ORDERS[order][0])
     if limit:
-        query += " LIMIT {0}".format(limit)
-    if offset:
-        query += " OFFSET {0}".format(offset)
+        query += " LIMIT {0}".format(int(limit))
+    if offset and after is None:
+        query += " OFFSET {0}".format(int(offset))
 
-    cursor.execute(query)
-    c_list = cursor.fetchall()
-    columns = [i[0] for i in cursor.description]
+    cursor.execute(query, params or None)
+    c_list = fetch_dicts(cursor)
     cursor.close()
 
-    return c_list, columns
\ No newline at end of file
+    return c_list
@@ -0,0 +1,210 @@
+from django.db import connection
+from decider_backend.settings import COUNTERS_BUFFERED
+
+# every counter change is a single UPDATE ... RETURNING statement, postgres applies it
+# to the current row version, so concurrent writers never overwrite each other's increments.
+# In the buffered mode increments are appended to d_counter_delta instead, which takes no
+# lock on the counted row, and fold_deltas moves them into the counters in batches.
+
+TABLES = {
+    'question': 'd_question',
+    'comment': 'd_comment',
+    'poll_item': 'd_poll_item'
+}
+
+# question counters that move the popular tab ordering with them
+POPULARITY_FIELDS = ['likes_count', 'comments_count']
+
+SPAM_THRESHOLD = 5
+
+UPDATE_QUERY = """UPDATE {0}
+                  SET {1}
+                  WHERE id = %s
+                  RETURNING {2}"""
+
+VOTES_QUERY = """WITH item AS (UPDATE d_poll_item
+                                SET votes_count = votes_count + %s
+                                WHERE id = %s
+                                RETURNING question_id, votes_count),
+                       question AS (UPDATE d_question
+                                    SET popularity = popularity + %s
+                                    WHERE id IN (SELECT question_id FROM item))
+                  SELECT votes_count FROM item"""
+
+DELTA_QUERY = """INSERT INTO d_counter_delta (entity, entity_id, field, delta, creation_date)
+                 VALUES {0}"""
+
+VOTES_DELTA_QUERY = """INSERT INTO d_counter_delta (entity, entity_id, field, delta, creation_date)
+                       SELECT 'poll_item', id, 'votes_count', %s, now() FROM d_poll_item WHERE id = %s
+                       UNION ALL
+                       SELECT 'question', question_id, 'popularity', %s, now() FROM d_poll_item WHERE id = %s"""
+
+PENDING = """COALESCE((SELECT sum(d_counter_delta.delta)
+                        FROM d_counter_delta
+                        WHERE d_counter_delta.entity = '{0}' AND d_counter_delta.entity_id = {1}
+                          AND d_counter_delta.field = '{2}'), 0)"""
+
+VALUE_QUERY = """SELECT {1}.{2} + """ + PENDING.format('{0}', '{1}.id', '{2}') + """
+                 FROM {1}
+                 WHERE {1}.id = %s"""
+
+PENDING_QUERY = """SELECT entity_id, field, sum(delta)
+                   FROM d_counter_delta
+                   WHERE entity = %s AND entity_id IN ({0})
+                   GROUP BY entity_id, field"""
+
+FOLD_LIMIT_QUERY = """SELECT max(id) FROM (SELECT id FROM d_counter_delta ORDER BY id LIMIT %s) batch"""
+
+# deltas of transactions that commit after the batch is picked stay behind for the next fold
+FOLD_QUERY = """WITH folded AS (DELETE FROM d_counter_delta
+                                 WHERE id <= %s
+                                 RETURNING entity, entity_id, field, delta)
+                SELECT entity, entity_id, field, sum(delta)
+                FROM folded
+                GROUP BY entity, entity_id, field"""
+
+
+def pending(entity, entity_id_sql, field):
+    """
+    SQL expression for the not yet folded deltas of a counter,
+    to be added to the counter column in read queries.
+    """
+    return PENDING.format(entity, entity_id_sql, field)
+
+
+def add_deltas(deltas):
+    cursor = connection.cursor()
+
+    values = ', '.join(['(%s, %s, %s, %s, now())'] * len(deltas))
+    cursor.execute(DELTA_QUERY.format(values), [value for delta in deltas for value in delta])
+    cursor.close()
+
+
+def get_value(entity, entity_id, field):
+    cursor = connection.cursor()
+
+    cursor.execute(VALUE_QUERY.format(entity, TABLES[entity], field), [int(entity_id)])
+    res = cursor.fetchone()
+    cursor.close()
+
+    return res[0] if res else None
+
+
+def get_pending(entity, entity_ids):
+    """
+    Returns {entity_id: {field: delta}} of the not yet folded deltas of the given entities.
+    """
+    if not entity_ids:
+        return {}
+
+    cursor = connection.cursor()
+
+    entity_ids = ', '.join([str(int(x)) for x in entity_ids])
+    cursor.execute(PENDING_QUERY.format(entity_ids), [entity])
+    res = {}
+    for entity_id, field, delta in cursor.fetchall():
+        res.setdefault(entity_id, {})[field] = delta
+    cursor.close()
+
+    return res
+
+
+def add_pending(entity, rows, fields):
+    """
+    Adds the pending deltas to the counters of dict rows read from the entity table.
+    """
+    if not COUNTERS_BUFFERED:
+        return rows
+
+    deltas = get_pending(entity, [row['id'] for row in rows])
+    for row in rows:
+        for field in fields:
+            row[field] += deltas.get(row['id'], {}).get(field, 0)
+    return rows
+
+
+def fold_deltas(limit):
+    """
+    Moves up to limit buffered deltas into the counters and returns
+    the ids of the updated entities as {entity: set of ids}.
+    """
+    cursor = connection.cursor()
+
+    cursor.execute(FOLD_LIMIT_QUERY, [limit])
+    max_id = cursor.fetchone()[0]
+    if max_id is None:
+        cursor.close()
+        return {}
+
+    cursor.execute(FOLD_QUERY, [max_id])
+    folded = {}
+    for entity, entity_id, field, delta in cursor.fetchall():
+        folded.setdefault(entity, {}).setdefault(entity_id, {})[field] = delta
+    cursor.close()
+
+    # rows are always locked in the same order, so two folds never deadlock
+    for entity in sorted(folded):
+        for entity_id in sorted(folded[entity]):
+            fields = folded[entity][entity_id]
+            assignments = ['{0} = {0} + %s'.format(field) for field in fields]
+            update_counters(entity, entity_id, assignments, fields.values(), ['id'])
+
+    return dict((entity, set(counters)) for entity, counters in folded.items())
+
+
+def update_counters(entity, entity_id, assignments, params, returning):
+    cursor = connection.cursor()
+
+    query = UPDATE_QUERY.format(TABLES[entity], ', '.join(assignments), ', '.join(returning))
+    cursor.execute(query, params + [int(entity_id)])
+    res = cursor.fetchone()
+    cursor.close()
+
+    return res
+
+
+def increment(entity, entity_id, field, delta=1):
+    """
+    Adds delta to a counter of an entity and returns the new value,
+    None if there is no such entity.
+    """
+    if COUNTERS_BUFFERED:
+        deltas = [(entity, int(entity_id), field, delta)]
+        if entity == 'question' and field in POPULARITY_FIELDS:
+            deltas.append((entity, int(entity_id), 'popularity', delta))
+        add_deltas(deltas)
+        return get_value(entity, entity_id, field)
+
+    assignments = ['{0} = {0} + %s'.format(field)]
+    params = [delta]
+    if entity == 'question' and field in POPULARITY_FIELDS:
+        assignments.append('popularity = popularity + %s')
+        params.append(delta)
+
+    res = update_counters(entity, entity_id, assignments, params, [field])
+    return res[0] if res else None
+
+
+def increment_votes(poll_item_id, delta=1):
+    cursor = connection.cursor()
+
+    if COUNTERS_BUFFERED:
+        cursor.execute(VOTES_DELTA_QUERY, [delta, int(poll_item_id), delta, int(poll_item_id)])
+        cursor.close()
+        return get_value('poll_item', poll_item_id, 'votes_count')
+
+    cursor.execute(VOTES_QUERY, [delta, int(poll_item_id), delta])
+    res = cursor.fetchone()
+    cursor.close()
+
+    return res[0] if res else None
+
+
+def report_spam(entity, entity_id):
+    """
+    Counts a spam report and deactivates the entity once it reaches SPAM_THRESHOLD.
+    Returns (spam_count, is_active), None if there is no such entity.
+    """
+    assignments = ['spam_count = spam_count + 1',
+                   'is_active = spam_count + 1 < %s']
+    return update_counters(entity, entity_id, assignments, [SPAM_THRESHOLD], ['spam_count', 'is_active'])
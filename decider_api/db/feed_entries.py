@@ -0,0 +1,156 @@
+from django.db import connection, IntegrityError, transaction
+from decider_api.db.rows import fetch_dicts
+from decider_backend.settings import COUNTERS_BUFFERED
+
+# d_feed_entry keeps one row per active question with everything a feed card shows,
+# so the new and popular tabs read a single narrow table instead of six joined ones
+
+COLUMNS = ['text', 'creation_date', 'category_id', 'is_anonymous', 'author_id',
+           'author_first_name', 'author_last_name', 'author_middle_name', 'author_username',
+           'author_uid', 'author_image_url', 'author_anonymous', 'poll_id',
+           'likes_count', 'comments_count', 'popularity', 'poll_items']
+
+POLL_ITEMS = """(SELECT json_agg(json_build_object('id', d_poll_item.id,
+                                                  'text', d_poll_item.text,
+                                                  'image_url', item_picture.url,
+                                                  'preview_url', item_picture.preview_url,
+                                                  'renditions', item_picture.renditions::json,
+                                                  'votes_count', d_poll_item.votes_count)
+                                ORDER BY d_poll_item.id)
+                FROM d_poll_item
+                  LEFT JOIN d_picture item_picture ON d_poll_item.picture_id = item_picture.id
+                WHERE d_poll_item.poll_id = {0})::text"""
+
+SOURCE_QUERY = """SELECT d_question.id as question_id, d_question.text, d_question.creation_date,
+                         d_question.category_id, d_question.is_anonymous, d_question.author_id,
+                         d_user.first_name as author_first_name, d_user.last_name as author_last_name,
+                         d_user.middle_name as author_middle_name, d_user.username as author_username,
+                         d_user.uid as author_uid, d_picture.url as author_image_url,
+                         d_user.is_anonymous as author_anonymous, d_poll.id as poll_id,
+                         d_question.likes_count, d_question.comments_count, d_question.popularity,
+                         """ + POLL_ITEMS.format('d_poll.id') + """ as poll_items
+                  FROM d_question
+                     LEFT JOIN d_user ON d_question.author_id = d_user.id
+                     LEFT JOIN d_picture ON d_picture.id = d_user.avatar_id
+                     LEFT JOIN d_poll ON d_question.id = d_poll.question_id
+                  WHERE d_question.is_active = TRUE AND d_question.id IN ({0})"""
+
+DELETE_QUERY = """DELETE FROM d_feed_entry
+                  WHERE question_id IN ({0})
+                    AND question_id NOT IN (SELECT id FROM d_question WHERE id IN ({0}) AND is_active = TRUE)"""
+
+# updating in place keeps concurrent refreshes of one question from racing on the primary key
+UPDATE_QUERY = """UPDATE d_feed_entry
+                  SET """ + ', '.join(['{0} = source.{0}'.format(column) for column in COLUMNS]) + """
+                  FROM (""" + SOURCE_QUERY + """) source
+                  WHERE d_feed_entry.question_id = source.question_id"""
+
+INSERT_QUERY = """INSERT INTO d_feed_entry (question_id, """ + ', '.join(COLUMNS) + """)
+                  SELECT source.question_id, """ + ', '.join(['source.' + column for column in COLUMNS]) + """
+                  FROM (""" + SOURCE_QUERY + """) source
+                  WHERE NOT EXISTS (SELECT 1 FROM d_feed_entry WHERE question_id = source.question_id)"""
+
+# likes, comments and votes only move counters, their entries are brought up to date
+# without going through SOURCE_QUERY and its joins
+COUNTERS_QUERY = """UPDATE d_feed_entry
+                    SET likes_count = d_question.likes_count, comments_count = d_question.comments_count,
+                        popularity = d_question.popularity{1}
+                    FROM d_question
+                    WHERE d_feed_entry.question_id = d_question.id AND d_question.id IN ({0})"""
+
+QUERY = """SELECT d_feed_entry.question_id as id, d_feed_entry.text, d_feed_entry.creation_date,
+                  TRUE as is_active, d_feed_entry.category_id, d_feed_entry.poll_id, d_feed_entry.author_id,
+                  d_feed_entry.likes_count, d_feed_entry.comments_count, d_feed_entry.is_anonymous,
+                  d_feed_entry.author_first_name, d_feed_entry.author_last_name,
+                  d_feed_entry.author_middle_name, d_feed_entry.author_username,
+                  d_feed_entry.author_uid, d_feed_entry.author_image_url,
+                  d_feed_entry.author_anonymous, d_feed_entry.popularity,
+                  d_feed_entry.poll_items::json as poll_items
+           FROM d_feed_entry"""
+
+KEYSET = " (d_feed_entry.{0}, d_feed_entry.question_id) < (%s, %s)"
+
+INSERT_ATTEMPTS = 3
+
+
+def refresh_feed_entries(q_ids):
+    """
+    Brings the feed entries of the given questions in line with d_question and
+    the tables it joins, removing the entries of inactive or deleted questions.
+    """
+    if not q_ids:
+        return
+
+    cursor = connection.cursor()
+
+    q_ids = ', '.join([str(int(x)) for x in q_ids])
+    cursor.execute(DELETE_QUERY.format(q_ids))
+    cursor.execute(UPDATE_QUERY.format(q_ids))
+    for attempt in range(INSERT_ATTEMPTS):
+        try:
+            # a concurrent refresh of the same question may insert its entry first
+            with transaction.atomic():
+                cursor.execute(INSERT_QUERY.format(q_ids))
+            break
+        except IntegrityError:
+            if attempt == INSERT_ATTEMPTS - 1:
+                raise
+            # its entry is committed by now, update it and insert the ones still missing
+            cursor.execute(UPDATE_QUERY.format(q_ids))
+    cursor.close()
+
+
+def refresh_feed_counters(q_ids, poll_items=False, folded=False):
+    """
+    Copies the like, comment and popularity counters of the given questions into
+    their feed entries, and the poll item vote counts with poll_items. Content
+    changes go through refresh_feed_entries.
+    """
+    # buffered counters only move when their deltas are folded, the fold refreshes
+    # the entries then; a refresh from the writers would queue them on the entry row
+    if not q_ids or (COUNTERS_BUFFERED and not folded):
+        return
+
+    cursor = connection.cursor()
+
+    q_ids = ', '.join([str(int(x)) for x in q_ids])
+    votes = ', poll_items = ' + POLL_ITEMS.format('d_feed_entry.poll_id') if poll_items else ''
+    cursor.execute(COUNTERS_QUERY.format(q_ids, votes))
+    cursor.close()
+
+
+def get_feed_entries(**kwargs):
+    cursor = connection.cursor()
+    query = QUERY
+    conditions = []
+    params = []
+
+    fqid = kwargs.get('first_question_id')
+    if fqid > -1:
+        conditions.append(" d_feed_entry.question_id < {0}".format(fqid))
+
+    if kwargs.get('categories'):
+        category_ids = (', '.join([str(x) for x in kwargs.get('categories')]))
+        conditions.append(' d_feed_entry.category_id IN (%s)' % category_ids)
+
+    after = kwargs.get('after')
+    if after is not None:
+        conditions.append(KEYSET.format(kwargs.get('sort_key')))
+        params.extend(after)
+
+    if conditions:
+        query += " WHERE" + " AND".join(conditions)
+
+    if kwargs.get('order_by'):
+        query += " ORDER BY " + kwargs.get('order_by')
+
+    if kwargs.get('limit') is not None:
+        query += " LIMIT %s " % kwargs.get('limit')
+    if kwargs.get('offset') is not None and after is None:
+        query += " OFFSET %s " % kwargs.get('offset')
+
+    cursor.execute(query, params or None)
+    entries = fetch_dicts(cursor)
+    cursor.close()
+
+    return entries
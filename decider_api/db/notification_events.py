@@ -0,0 +1,43 @@
+from django.db import connection
+from decider_api.db.rows import fetch_dicts
+
+DRAIN_LIMIT_QUERY = """SELECT max(id) FROM (SELECT id FROM d_notification_event ORDER BY id LIMIT %s) batch"""
+
+# takes the batch out of the outbox and resolves who each event notifies;
+# events of entities deleted in the meantime come back without a recipient
+DRAIN_QUERY = """WITH drained AS (DELETE FROM d_notification_event
+                                  WHERE id <= %s
+                                  RETURNING id, kind, entity_id, actor_id)
+                 SELECT drained.id, drained.kind, drained.actor_id,
+                        CASE drained.kind WHEN 'comment' THEN comment_question.author_id
+                                          WHEN 'comment_like' THEN d_comment.author_id
+                                          ELSE poll_question.author_id END AS recipient_id,
+                        COALESCE(comment_question.id, poll_question.id) AS question_id,
+                        d_comment.id AS comment_id
+                 FROM drained
+                   LEFT JOIN d_comment
+                     ON drained.kind IN ('comment', 'comment_like') AND d_comment.id = drained.entity_id
+                   LEFT JOIN d_question comment_question ON comment_question.id = d_comment.question_id
+                   LEFT JOIN d_poll ON drained.kind = 'vote' AND d_poll.id = drained.entity_id
+                   LEFT JOIN d_question poll_question ON poll_question.id = d_poll.question_id
+                 ORDER BY drained.id"""
+
+
+def drain_events(limit):
+    """
+    Removes up to limit events from the outbox and returns them as dicts
+    with kind, actor_id, recipient_id, question_id and comment_id.
+    """
+    cursor = connection.cursor()
+
+    cursor.execute(DRAIN_LIMIT_QUERY, [limit])
+    max_id = cursor.fetchone()[0]
+    if max_id is None:
+        cursor.close()
+        return []
+
+    cursor.execute(DRAIN_QUERY, [max_id])
+    res = fetch_dicts(cursor)
+    cursor.close()
+
+    return res
@@ -1,58 +1,191 @@
-from django.db import connection
-from django.utils import timezone
+from django.db import connection, transaction, IntegrityError
+from decider_api.db.counters import pending
+from decider_backend.settings import COUNTERS_BUFFERED
 from decider_app.views.utils.response_codes import I_CODE_UNKNOWN_ENTITY, I_CODE_NO_MATCH, I_CODE_ALREADY_VOTED, \
-    I_CODE_VOTE_OK
+    I_CODE_VOTE_OK, I_CODE_UNKNOWN_QUESTION
 
-SELECT_QUERY = """
-                  SELECT d_poll_item.id as pi_id,
-                         d_poll.id as p_id,
-                         d_vote.id as voted
-                  FROM d_poll_item
-                  LEFT JOIN d_poll ON d_poll.id=d_poll_item.poll_id
-                  LEFT JOIN d_vote ON d_vote.poll_id=d_poll.id AND d_vote.user_id={0}
-                  WHERE d_poll_item.id={1}
-               """
+# records the vote, counts it and reads back the counts of every item of the poll in one statement;
+# the unique (user, poll) constraint of d_vote rejects a second vote of the same user
+CAST_QUERY = """WITH item AS (SELECT id, poll_id, question_id
+                              FROM d_poll_item
+                              WHERE id = %(poll_item_id)s AND question_id = %(question_id)s),
+                     vote AS (INSERT INTO d_vote (user_id, poll_id, poll_item_id, creation_date)
+                              SELECT %(user_id)s, poll_id, id, now() FROM item
+                              RETURNING id, poll_item_id),
+                     {0}
+                SELECT d_poll_item.id, {1}, (SELECT id FROM vote), d_poll_item.poll_id
+                FROM d_poll_item{2}
+                WHERE d_poll_item.poll_id IN (SELECT poll_id FROM item)
+                ORDER BY d_poll_item.id"""
 
-INSERT_QUERY = """INSERT INTO d_vote (user_id, poll_id, poll_item_id, creation_date) values({0}, {1}, {2}, {3})"""
+CAST_COUNTERS = """counted AS (UPDATE d_poll_item
+                                SET votes_count = votes_count + 1
+                                WHERE id IN (SELECT poll_item_id FROM vote)
+                                RETURNING id, votes_count),
+                   question AS (UPDATE d_question
+                                SET popularity = popularity + 1
+                                WHERE id IN (SELECT question_id FROM item) AND EXISTS (SELECT 1 FROM vote))"""
 
-UPDATE_QUERY = """UPDATE d_poll_item
-                  SET votes_count = votes_count + 1
-                  WHERE id={0}"""
+CAST_DELTAS = """counted AS (INSERT INTO d_counter_delta (entity, entity_id, field, delta, creation_date)
+                              SELECT 'poll_item', poll_item_id, 'votes_count', 1, now() FROM vote
+                              UNION ALL
+                              SELECT 'question', item.question_id, 'popularity', 1, now() FROM item, vote)"""
 
-VOTES_QUERY = """SELECT d_poll_item.id, votes_count
-                  FROM d_poll
-                  LEFT JOIN d_poll_item ON d_poll_item.poll_id = d_poll.id
-                  WHERE d_poll.id={0}
-                  ORDER BY d_poll_item.id"""
+if COUNTERS_BUFFERED:
+    # deltas written by the statement are not visible to it yet, the new vote is added by hand
+    CAST_QUERY = CAST_QUERY.format(CAST_DELTAS,
+                                   "d_poll_item.votes_count + " + pending('poll_item', 'd_poll_item.id', 'votes_count') +
+                                   " + CASE WHEN d_poll_item.id IN (SELECT poll_item_id FROM vote) THEN 1 ELSE 0 END",
+                                   "")
+else:
+    CAST_QUERY = CAST_QUERY.format(CAST_COUNTERS,
+                                   "COALESCE(counted.votes_count, d_poll_item.votes_count)",
+                                   "\n                  LEFT JOIN counted ON counted.id = d_poll_item.id")
 
+# the batch form of CAST_QUERY for votes in polls of different questions; a poll the user
+# has voted in before matches but gets no vote row
+CAST_MANY_QUERY = """WITH request (question_id, poll_item_id) AS (VALUES {0}),
+                          item AS (SELECT d_poll_item.id, d_poll_item.poll_id, d_poll_item.question_id
+                                   FROM d_poll_item
+                                     JOIN request ON request.poll_item_id = d_poll_item.id
+                                                 AND request.question_id = d_poll_item.question_id),
+                          vote AS (INSERT INTO d_vote (user_id, poll_id, poll_item_id, creation_date)
+                                   SELECT %s, poll_id, id, now() FROM item
+                                   WHERE NOT EXISTS (SELECT 1 FROM d_vote
+                                                     WHERE d_vote.user_id = %s AND d_vote.poll_id = item.poll_id)
+                                   RETURNING id, poll_id, poll_item_id),
+                          {1}
+                     SELECT d_poll_item.question_id, d_poll_item.poll_id, d_poll_item.id, {2}, vote.id
+                     FROM d_poll_item
+                       LEFT JOIN vote ON vote.poll_item_id = d_poll_item.id{3}
+                     WHERE d_poll_item.poll_id IN (SELECT poll_id FROM item)
+                     ORDER BY d_poll_item.question_id, d_poll_item.id"""
 
-def check_poll_item(user_id, p_id, pi_id):
+CAST_MANY_COUNTERS = """counted AS (UPDATE d_poll_item
+                                     SET votes_count = votes_count + 1
+                                     WHERE id IN (SELECT poll_item_id FROM vote)
+                                     RETURNING id, votes_count),
+                        question AS (UPDATE d_question
+                                     SET popularity = popularity + 1
+                                     WHERE id IN (SELECT question_id FROM item
+                                                  WHERE poll_id IN (SELECT poll_id FROM vote)))"""
+
+CAST_MANY_DELTAS = """counted AS (INSERT INTO d_counter_delta (entity, entity_id, field, delta, creation_date)
+                                   SELECT 'poll_item', poll_item_id, 'votes_count', 1, now() FROM vote
+                                   UNION ALL
+                                   SELECT 'question', item.question_id, 'popularity', 1, now()
+                                   FROM item JOIN vote ON vote.poll_id = item.poll_id)"""
+
+if COUNTERS_BUFFERED:
+    CAST_MANY_QUERY = CAST_MANY_QUERY.format('{0}', CAST_MANY_DELTAS,
+                                             "d_poll_item.votes_count + " +
+                                             pending('poll_item', 'd_poll_item.id', 'votes_count') +
+                                             " + CASE WHEN vote.id IS NULL THEN 0 ELSE 1 END",
+                                             "")
+else:
+    CAST_MANY_QUERY = CAST_MANY_QUERY.format('{0}', CAST_MANY_COUNTERS,
+                                             "COALESCE(counted.votes_count, d_poll_item.votes_count)",
+                                             "\n                       LEFT JOIN counted ON counted.id = d_poll_item.id")
+
+CHECK_QUERY = """SELECT EXISTS (SELECT 1 FROM d_question WHERE id = %s),
+                        EXISTS (SELECT 1 FROM d_poll_item WHERE id = %s)"""
+
+CHECK_MANY_QUERY = """SELECT request.question_id,
+                             EXISTS (SELECT 1 FROM d_question WHERE id = request.question_id),
+                             EXISTS (SELECT 1 FROM d_poll_item WHERE id = request.poll_item_id)
+                      FROM (VALUES {0}) AS request (question_id, poll_item_id)"""
+
+USER_VOTES_QUERY = """SELECT poll_id, poll_item_id
+                      FROM d_vote
+                      WHERE user_id = {0} AND poll_id IN ({1})"""
+
+
+def cast_vote(user_id, q_id, poll_item_id):
+    """
+    Votes for a poll item of a question in one statement.
+    Returns (code, vote_id, poll_id, [(poll_item_id, votes_count)]), the
+    counts covering every item of the poll once the vote is counted.
+    """
     cursor = connection.cursor()
 
-    query = SELECT_QUERY.format(user_id, pi_id)
-    cursor.execute(query)
-    res = cursor.fetchone()
+    params = {'user_id': int(user_id), 'question_id': int(q_id), 'poll_item_id': int(poll_item_id)}
+    try:
+        with transaction.atomic():
+            cursor.execute(CAST_QUERY, params)
+    except IntegrityError:
+        cursor.close()
+        return I_CODE_ALREADY_VOTED, None, None, None
+    res = cursor.fetchall()
+
     if not res:
-        return I_CODE_UNKNOWN_ENTITY
-    elif p_id != res[1]:
-        return I_CODE_NO_MATCH
-    elif res[2]:
-        return I_CODE_ALREADY_VOTED
-    else:
-        return I_CODE_VOTE_OK
+        # nothing matched, only now find out why
+        cursor.execute(CHECK_QUERY, [int(q_id), int(poll_item_id)])
+        question_exists, item_exists = cursor.fetchone()
+        cursor.close()
+        if not question_exists:
+            return I_CODE_UNKNOWN_QUESTION, None, None, None
+        if not item_exists:
+            return I_CODE_UNKNOWN_ENTITY, None, None, None
+        return I_CODE_NO_MATCH, None, None, None
 
+    cursor.close()
+    return I_CODE_VOTE_OK, res[0][2], res[0][3], [(row[0], row[1]) for row in res]
+
+
+def cast_votes(user_id, votes):
+    """
+    Batch form of cast_vote for a list of (question_id, poll_item_id) of different questions.
+    Returns {question_id: (code, vote_id, poll_id, [(poll_item_id, votes_count)])}.
+    """
+    if not votes:
+        return {}
 
-def vote_on_poll(user_id, poll_id, poll_item_id):
     cursor = connection.cursor()
 
-    from decider_app.models import Vote
-    Vote.objects.create(user_id=user_id, poll_id=poll_id, poll_item_id=poll_item_id)
+    values = ', '.join(['({0}, {1})'.format(int(q_id), int(pi_id)) for q_id, pi_id in votes])
+    for attempt in range(2):
+        try:
+            # a vote committed concurrently fails the insert, the retry sees it and skips that poll
+            with transaction.atomic():
+                cursor.execute(CAST_MANY_QUERY.format(values), [int(user_id), int(user_id)])
+            break
+        except IntegrityError:
+            if attempt:
+                raise
 
-    query = UPDATE_QUERY.format(poll_item_id)
-    cursor.execute(query)
+    res = {}
+    for q_id, poll_id, pi_id, votes_count, vote_id in cursor.fetchall():
+        code, cast_id, cast_poll_id, items = res.setdefault(q_id, (I_CODE_ALREADY_VOTED, None, poll_id, []))
+        items.append((pi_id, votes_count))
+        if vote_id:
+            res[q_id] = (I_CODE_VOTE_OK, vote_id, poll_id, items)
 
-    query = VOTES_QUERY.format(poll_id)
-    cursor.execute(query)
-    res = cursor.fetchall()
+    missed = [(q_id, pi_id) for q_id, pi_id in votes if int(q_id) not in res]
+    if missed:
+        # nothing matched for these, only now find out why
+        values = ', '.join(['({0}, {1})'.format(int(q_id), int(pi_id)) for q_id, pi_id in missed])
+        cursor.execute(CHECK_MANY_QUERY.format(values))
+        for q_id, question_exists, item_exists in cursor.fetchall():
+            if not question_exists:
+                res[q_id] = (I_CODE_UNKNOWN_QUESTION, None, None, None)
+            elif not item_exists:
+                res[q_id] = (I_CODE_UNKNOWN_ENTITY, None, None, None)
+            else:
+                res[q_id] = (I_CODE_NO_MATCH, None, None, None)
+    cursor.close()
+
+    return res
+
+
+def get_user_votes(user_id, poll_ids):
+    if not poll_ids:
+        return {}
+
+    cursor = connection.cursor()
+
+    poll_ids = ', '.join([str(x) for x in poll_ids])
+    cursor.execute(USER_VOTES_QUERY.format(user_id, poll_ids))
+    res = dict(cursor.fetchall())
+    cursor.close()
 
-    return res
\ No newline at end of file
+    return res
@@ -1,10 +1,15 @@
 from django.db import connection
+from decider_api.db.feed_entries import get_feed_entries
+from decider_api.db.rows import fetch_dicts, fetch_dict
+from decider_api.utils.cursor_helper import encode_cursor, decode_cursor
+from decider_backend.settings import FEED_READ_MODEL
 
 
 def tab_switch(case):
     return {
         "new": get_new_questions,
         "popular": get_popular_questions,
+        "hot": get_hot_questions,
         "my": get_my_questions
     }.get(case, None)
 
@@ -14,31 +19,59 @@ QUERY = """SELECT d_question.id, d_question.text, d_question.creation_date, d_qu
                   d_user.first_name as author_first_name, d_user.last_name as author_last_name,
                   d_user.middle_name as author_middle_name, d_user.username as author_username,
                   d_user.uid as author_uid, d_picture.url as author_image_url,
-                  d_user.is_anonymous as author_anonymous, d_question_likes.id as voted,
-                  (likes_count + d_question.comments_count + sum(d_poll_item.votes_count)) as popularity
+                  d_user.is_anonymous as author_anonymous, d_question.popularity, d_question.status{columns}
            FROM d_question
               LEFT JOIN d_user ON d_question.author_id = d_user.id
               LEFT JOIN d_picture ON d_picture.id = d_user.avatar_id
-              LEFT JOIN d_poll ON d_question.id = d_poll.question_id
-              LEFT JOIN d_question_likes ON d_question_likes.question_id = d_question.id
-                                        AND d_question_likes.user_id = {}
-              LEFT JOIN d_poll_item ON d_poll_item.poll_id = d_poll.id"""
+              LEFT JOIN d_poll ON d_question.id = d_poll.question_id{joins}"""
 
 
 
 WHERE = " WHERE d_question.is_active=TRUE"
 
-GROUP_BY = " GROUP BY d_question.id, d_poll.id, d_user.id, d_picture.url, d_question_likes.id"
+HOT_COLUMNS = ", d_question_hot_score.score as hot_score"
+
+HOT_JOIN = """
+              INNER JOIN d_question_hot_score ON d_question_hot_score.question_id = d_question.id"""
+
+KEYSET = " ({0}, d_question.id) < (%s, %s)"
+
+# tab -> (sort expression, result column)
+SORT_KEYS = {
+    "new": ("d_question.creation_date", "creation_date"),
+    "popular": ("d_question.popularity", "popularity"),
+    "hot": ("d_question_hot_score.score", "hot_score"),
+    "my": ("d_question.creation_date", "creation_date")
+}
+
+# poll items of every returned question, ordered and serialized by postgres
+POLL_ITEMS_COLUMNS = """,
+                  (SELECT json_agg(json_build_object('id', d_poll_item.id,
+                                                     'text', d_poll_item.text,
+                                                     'image_url', d_picture.url,
+                                                     'preview_url', d_picture.preview_url,
+                                                     'renditions', d_picture.renditions::json,
+                                                     'votes_count', d_poll_item.votes_count)
+                                   ORDER BY d_poll_item.id)
+                   FROM d_poll_item
+                     LEFT JOIN d_picture ON d_poll_item.picture_id = d_picture.id
+                   WHERE d_poll_item.poll_id = d_poll.id) as poll_items"""
 
 
 def get_questions(*args, **kwargs):
     cursor = connection.cursor()
     where = WHERE
+    params = []
     fqid = kwargs.get('first_question_id')
     if fqid > -1:
         where += " AND d_question.id < {0}".format(fqid)
 
-    query = QUERY.format(kwargs.get('user_id')) + where
+    columns = kwargs.get('columns', '')
+    if kwargs.get('with_poll_items'):
+        columns += POLL_ITEMS_COLUMNS
+
+    query = QUERY.format(columns=columns,
+                         joins=kwargs.get('joins', '')) + where
     if kwargs.get('categories'):
         category_ids = (', '.join([str(x) for x in kwargs.get('categories')]))
         query += ' AND d_question.category_id IN (%s)' % category_ids
@@ -46,52 +79,102 @@ def get_questions(*args, **kwargs):
         for item in kwargs.get('where'):
             query += ' AND' + item
 
-    if kwargs.get('extras'):
-        query += kwargs.get('extras')
+    after = kwargs.get('after')
+    if after is not None:
+        query += ' AND' + KEYSET.format(SORT_KEYS[kwargs.get('tab')][0])
+        params.extend(after)
+
+    if kwargs.get('order_by'):
+        query += " ORDER BY " + kwargs.get('order_by')
 
     if kwargs.get('limit') is not None:
         query += " LIMIT %s " % kwargs.get('limit')
-    if kwargs.get('offset') is not None:
+    if kwargs.get('offset') is not None and after is None:
         query += " OFFSET %s " % kwargs.get('offset')
 
-    cursor.execute(query)
-    questions = cursor.fetchall()
-    columns = [i[0] for i in cursor.description]
+    cursor.execute(query, params or None)
+    questions = fetch_dicts(cursor)
     cursor.close()
 
-    return questions, columns
+    return questions
+
+
+def get_cursor_position(tab, cursor):
+    if not cursor:
+        return None
+    return decode_cursor(cursor, tab, date_key=SORT_KEYS[tab][1] == 'creation_date')
+
+
+def get_next_cursor(tab, questions, limit):
+    if not questions or limit is None or len(questions) < limit:
+        return None
+    last = questions[-1]
+    return encode_cursor(tab, last[SORT_KEYS[tab][1]], last['id'])
 
 
 def get_new_questions(*args, **kwargs):
-    extras = GROUP_BY + " ORDER BY d_question.creation_date DESC"
-    return get_questions(user_id=kwargs.get('user_id'),
+    if FEED_READ_MODEL:
+        return get_feed_entries(limit=kwargs.get('limit'), offset=kwargs.get('offset'),
+                                categories=kwargs.get('categories'),
+                                order_by="d_feed_entry.creation_date DESC, d_feed_entry.question_id DESC",
+                                first_question_id=kwargs.get('first_question_id'),
+                                sort_key='creation_date',
+                                after=get_cursor_position('new', kwargs.get('cursor')))
+    return get_questions(user_id=kwargs.get('user_id'), tab='new',
                          limit=kwargs.get('limit'), offset=kwargs.get('offset'),
-                         categories=kwargs.get('categories'), extras=extras,
-                         first_question_id=kwargs.get('first_question_id'))
+                         categories=kwargs.get('categories'),
+                         with_poll_items=kwargs.get('with_poll_items'),
+                         order_by="d_question.creation_date DESC, d_question.id DESC",
+                         first_question_id=kwargs.get('first_question_id'),
+                         after=get_cursor_position('new', kwargs.get('cursor')))
 
 
 def get_popular_questions(*args, **kwargs):
-    extras = GROUP_BY + " ORDER BY popularity DESC"
-    return get_questions(user_id=kwargs.get('user_id'),
+    if FEED_READ_MODEL:
+        return get_feed_entries(limit=kwargs.get('limit'), offset=kwargs.get('offset'),
+                                categories=kwargs.get('categories'),
+                                order_by="d_feed_entry.popularity DESC, d_feed_entry.question_id DESC",
+                                sort_key='popularity',
+                                after=get_cursor_position('popular', kwargs.get('cursor')))
+    return get_questions(user_id=kwargs.get('user_id'), tab='popular',
                          limit=kwargs.get('limit'), offset=kwargs.get('offset'),
-                         categories=kwargs.get('categories'), extras=extras)
+                         categories=kwargs.get('categories'),
+                         with_poll_items=kwargs.get('with_poll_items'),
+                         order_by="d_question.popularity DESC, d_question.id DESC",
+                         after=get_cursor_position('popular', kwargs.get('cursor')))
+
+
+def get_hot_questions(*args, **kwargs):
+    return get_questions(user_id=kwargs.get('user_id'), tab='hot',
+                         limit=kwargs.get('limit'), offset=kwargs.get('offset'),
+                         categories=kwargs.get('categories'),
+                         with_poll_items=kwargs.get('with_poll_items'),
+                         columns=HOT_COLUMNS, joins=HOT_JOIN,
+                         order_by="d_question_hot_score.score DESC, d_question_hot_score.question_id DESC",
+                         after=get_cursor_position('hot', kwargs.get('cursor')))
 
 
 def get_my_questions(*args, **kwargs):
     where = [" d_question.author_id=%s" % kwargs.get('user_id')]
-    extras = GROUP_BY + " ORDER BY d_question.creation_date DESC"
-    return get_questions(user_id=kwargs.get('user_id'),
+    return get_questions(user_id=kwargs.get('user_id'), tab='my',
                          limit=kwargs.get('limit'), offset=kwargs.get('offset'),
-                         categories=kwargs.get('categories'), where=where, extras=extras,
-                         first_question_id=kwargs.get('first_question_id'))
+                         categories=kwargs.get('categories'),
+                         with_poll_items=kwargs.get('with_poll_items'), where=where,
+                         order_by="d_question.creation_date DESC, d_question.id DESC",
+                         first_question_id=kwargs.get('first_question_id'),
+                         after=get_cursor_position('my', kwargs.get('cursor')))
 
 
-def get_question(user_id, q_id):
-    extras = " WHERE d_question.id=%s" % q_id + GROUP_BY
+def get_question(q_id):
+    extras = " WHERE d_question.id=%s" % q_id
     cursor = connection.cursor()
-    cursor.execute(QUERY.format(user_id) + extras)
-    question = cursor.fetchone()
-    columns = [i[0] for i in cursor.description]
+    cursor.execute(QUERY.format(columns='', joins='') + extras)
+    question = fetch_dict(cursor)
     cursor.close()
 
-    return question, columns
\ No newline at end of file
+    return question
+
+
+def get_questions_by_ids(q_ids, with_poll_items=False):
+    q_ids = ', '.join([str(x) for x in q_ids])
+    return get_questions(where=[" d_question.id IN (%s)" % q_ids], with_poll_items=with_poll_items)
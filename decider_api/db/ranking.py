@@ -0,0 +1,33 @@
+from django.db import connection
+
+DECAY = "power(0.5, extract(epoch FROM (now() - {0})) / {1})"
+
+DELETE_QUERY = """DELETE FROM d_question_hot_score
+                  WHERE question_id IN ({0})"""
+
+INSERT_QUERY = """INSERT INTO d_question_hot_score (question_id, score, date_updated)
+                  SELECT d_question.id,
+                         (d_question.likes_count + 1) * """ + DECAY.format("d_question.creation_date", "{1}") + """
+                         + COALESCE((SELECT sum(""" + DECAY.format("d_vote.creation_date", "{1}") + """)
+                                     FROM d_vote
+                                       INNER JOIN d_poll ON d_poll.id = d_vote.poll_id
+                                     WHERE d_poll.question_id = d_question.id), 0)
+                         + COALESCE((SELECT sum(""" + DECAY.format("d_comment.creation_date", "{1}") + """)
+                                     FROM d_comment
+                                     WHERE d_comment.question_id = d_question.id
+                                       AND d_comment.is_active = TRUE), 0),
+                         now()
+                  FROM d_question
+                  WHERE d_question.id IN ({0})"""
+
+
+def update_hot_scores(q_ids, half_life):
+    if not q_ids:
+        return
+
+    cursor = connection.cursor()
+
+    q_ids = ', '.join([str(x) for x in q_ids])
+    cursor.execute(DELETE_QUERY.format(q_ids))
+    cursor.execute(INSERT_QUERY.format(q_ids, half_life))
+    cursor.close()
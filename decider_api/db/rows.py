@@ -0,0 +1,21 @@
+from itertools import izip
+
+
+def get_columns(cursor):
+    return [i[0] for i in cursor.description]
+
+
+def fetch_dicts(cursor):
+    """
+    Maps all rows of the last query to dicts in a single pass. Column names
+    are read from the cursor description once per query, not once per field.
+    """
+    columns = get_columns(cursor)
+    return [dict(izip(columns, row)) for row in cursor.fetchall()]
+
+
+def fetch_dict(cursor):
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(izip(get_columns(cursor), row))
@@ -0,0 +1,107 @@
+from collections import Counter
+from django.db import connection, transaction, IntegrityError
+from decider_api.db.rows import fetch_dicts
+
+# looking a stored image up marks it used, so remove_unused_images leaves it alone
+# for the grace period while the picture that is going to reference it is created
+FIND_QUERY = """UPDATE d_stored_image
+                SET last_used = now()
+                WHERE key IN ({0})
+                RETURNING id, key, url, renditions"""
+
+INSERT_QUERY = """INSERT INTO d_stored_image (key, url, renditions, refcount, last_used)
+                  SELECT %s, %s, %s, 0, now()
+                  WHERE NOT EXISTS (SELECT 1 FROM d_stored_image WHERE key = %s)"""
+
+REFCOUNT_QUERY = """UPDATE d_stored_image
+                    SET refcount = refcount + delta.refs, last_used = now()
+                    FROM (VALUES {0}) AS delta (id, refs)
+                    WHERE d_stored_image.id = delta.id"""
+
+# refcounts are kept by separate statements and can drift, an image a picture still points at is
+# never removed whatever its count says; the outer conditions are checked again on rows a
+# concurrent find_images or acquire_images changed while the delete waited for them
+REMOVE_QUERY = """DELETE FROM d_stored_image
+                  WHERE id IN (SELECT id FROM d_stored_image
+                               WHERE refcount <= 0 AND last_used < now() - interval '{0} seconds'
+                                 AND NOT EXISTS (SELECT 1 FROM d_picture
+                                                 WHERE image_id = d_stored_image.id
+                                                    OR preview_image_id = d_stored_image.id)
+                               ORDER BY id
+                               LIMIT %s)
+                    AND refcount <= 0 AND last_used < now() - interval '{0} seconds'
+                  RETURNING url, renditions"""
+
+
+def find_images(keys):
+    """
+    Returns {key: row} of the images already stored under the given keys.
+    """
+    if not keys:
+        return {}
+
+    cursor = connection.cursor()
+
+    cursor.execute(FIND_QUERY.format(', '.join(['%s'] * len(keys))), list(keys))
+    res = dict((row['key'], row) for row in fetch_dicts(cursor))
+    cursor.close()
+
+    return res
+
+
+def store_images(images):
+    """
+    Records processed images given as (key, url, renditions) and returns their rows
+    as find_images does, including the ones another upload recorded meanwhile.
+    """
+    if not images:
+        return {}
+
+    cursor = connection.cursor()
+
+    for key, url, renditions in images:
+        try:
+            # an upload of the same bytes in parallel may get there first, its row is as good
+            with transaction.atomic():
+                cursor.execute(INSERT_QUERY, [key, url, renditions, key])
+        except IntegrityError:
+            pass
+    cursor.close()
+
+    return find_images([image[0] for image in images])
+
+
+def acquire_images(image_ids):
+    update_refcounts(image_ids, 1)
+
+
+def release_images(image_ids):
+    update_refcounts(image_ids, -1)
+
+
+def update_refcounts(image_ids, delta):
+    image_ids = [int(x) for x in image_ids if x]
+    if not image_ids:
+        return
+
+    cursor = connection.cursor()
+
+    # a picture can use one image twice, as its image and its preview, and counts it twice
+    refs = Counter(image_ids)
+    cursor.execute(REFCOUNT_QUERY.format(', '.join(['({0}, {1})'.format(image_id, delta * count)
+                                                    for image_id, count in sorted(refs.items())])))
+    cursor.close()
+
+
+def remove_unused_images(grace, limit):
+    """
+    Deletes up to limit images no picture has used for grace seconds and
+    returns their (url, renditions), for the files to be removed.
+    """
+    cursor = connection.cursor()
+
+    cursor.execute(REMOVE_QUERY.format(int(grace)), [limit])
+    res = cursor.fetchall()
+    cursor.close()
+
+    return res
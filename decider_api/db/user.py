@@ -1,4 +1,5 @@
 from django.db import connection
+from decider_api.db.rows import fetch_dict
 
 QUERY = """SELECT d_user.id, d_user.uid, d_user.email, d_user.username,
                   d_user.first_name, d_user.last_name, d_user.middle_name,
@@ -20,8 +21,7 @@ def get_user_data(user_id):
 
     query = QUERY + where
     cursor.execute(query)
-    user = cursor.fetchone()
-    columns = [i[0] for i in cursor.description]
+    user = fetch_dict(cursor)
     cursor.close()
 
-    return user, columns
+    return user
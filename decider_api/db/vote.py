@@ -1,72 +1,161 @@
-from django.db import connection
-from django.utils import timezone
-from decider_app.views.utils.response_codes import I_CODE_ALREADY_VOTED, I_CODE_UNKNOWN_ENTITY, \
-    I_CODE_VOTE_OK
-
-
-GET_QUERY = """ SELECT d_{0}.id as {0}_id, d_{0}_likes.id as like_id
-                FROM d_{0}
-                  LEFT JOIN d_{0}_likes
-                    ON d_{0}.id = d_{0}_likes.{0}_id AND d_{0}_likes.user_id = {1}
-                WHERE d_{0}.id = {2};"""
-
-
-INSERT_QUESTION_QUERY = """INSERT INTO d_question_likes (user_id, question_id)
-                           VALUES ({0}, {1})"""
-
-DELETE_QUERY = """DELETE FROM d_{0}_likes
-                  WHERE user_id={1} AND {0}_id={2}"""
-
-ENTITY_UPDATE_QUERY = """UPDATE d_{0}
-                         SET likes_count = likes_count {2} 1
-                         WHERE id = {1}"""
+from django.db import connection, transaction, IntegrityError
+from decider_api.db.counters import increment, pending
+from decider_backend.settings import COUNTERS_BUFFERED
+
+
+# likes or unlikes in one statement: the like is deleted if it exists and inserted otherwise,
+# the counter moves by the difference and the new state comes back with the count
+TOGGLE_QUERY = """WITH entity AS (SELECT id FROM d_{0} WHERE id = %(entity_id)s),
+                       deleted AS (DELETE FROM d_{0}_likes
+                                   WHERE user_id = %(user_id)s AND {0}_id = %(entity_id)s
+                                   RETURNING id),
+                       inserted AS (INSERT INTO d_{0}_likes (user_id, {0}_id{1})
+                                    SELECT %(user_id)s, id{2} FROM entity
+                                    WHERE NOT EXISTS (SELECT 1 FROM deleted)
+                                    RETURNING id),
+                       counted AS ({3})
+                  SELECT EXISTS (SELECT 1 FROM entity), (SELECT id FROM inserted),
+                         (SELECT likes_count FROM counted)"""
+
+TOGGLE_COUNT_QUERY = """UPDATE d_{0}
+                        SET {1}
+                        WHERE id = %(entity_id)s
+                        RETURNING likes_count"""
+
+TOGGLE_DELTA = "(SELECT count(*) FROM inserted) - (SELECT count(*) FROM deleted)"
+
+# the batch form of TOGGLE_QUERY for a set of entities of one kind
+TOGGLE_MANY_QUERY = """WITH entity AS (SELECT id, {1} AS question_id FROM d_{0} WHERE id IN ({2})),
+                            deleted AS (DELETE FROM d_{0}_likes
+                                        WHERE user_id = %(user_id)s AND {0}_id IN (SELECT id FROM entity)
+                                        RETURNING {0}_id AS id),
+                            inserted AS (INSERT INTO d_{0}_likes (user_id, {0}_id{3})
+                                         SELECT %(user_id)s, id{4} FROM entity
+                                         WHERE id NOT IN (SELECT id FROM deleted)
+                                         RETURNING id AS like_id, {0}_id AS id),
+                            counted AS ({5})
+                       SELECT entity.id, entity.question_id, inserted.like_id, {6}
+                       FROM entity
+                         JOIN d_{0} ON d_{0}.id = entity.id
+                         LEFT JOIN inserted ON inserted.id = entity.id{7}"""
+
+TOGGLE_MANY_COUNT_QUERY = """UPDATE d_{0}
+                             SET {1}
+                             WHERE id IN (SELECT id FROM entity)
+                             RETURNING id, likes_count"""
+
+TOGGLE_MANY_DELTAS = """INSERT INTO d_counter_delta (entity, entity_id, field, delta, creation_date)
+                        {0}"""
+
+TOGGLE_MANY_DELTA = "CASE WHEN id IN (SELECT id FROM inserted) THEN 1 ELSE -1 END"
+
+USER_LIKES_QUERY = """SELECT {0}_id
+                      FROM d_{0}_likes
+                      WHERE user_id = {1} AND {0}_id IN ({2})"""
+
+
+def get_toggle_query(entity):
+    if COUNTERS_BUFFERED:
+        # the counter goes through the delta table in a second statement
+        counted = "SELECT NULL::integer AS likes_count"
+    else:
+        fields = ['likes_count', 'popularity'] if entity == 'question' else ['likes_count']
+        counted = TOGGLE_COUNT_QUERY.format(entity, ', '.join(['{0} = {0} + '.format(field) + TOGGLE_DELTA
+                                                               for field in fields]))
 
-LIKES_QUERY = """SELECT likes_count
-                 FROM d_{0}
-                 WHERE id = {1}"""
+    if entity == 'question':
+        return TOGGLE_QUERY.format(entity, '', '', counted)
+    return TOGGLE_QUERY.format(entity, ', creation_date', ', now()', counted)
 
 
-def get_vote(entity, entity_id, user_id):
+def toggle_like(entity, entity_id, user_id):
+    """
+    Likes the entity for the user, or takes the like back if it is there, in one statement.
+    Returns (like_id, likes_count), like_id being None when the like was taken back,
+    or None for an unknown entity.
+    """
     cursor = connection.cursor()
 
-    cursor.execute(GET_QUERY.format(entity, user_id, entity_id))
-    res = cursor.fetchone()
+    params = {'entity_id': int(entity_id), 'user_id': int(user_id)}
+    for attempt in range(2):
+        try:
+            # a concurrent toggle of the same like makes the insert hit the unique constraint,
+            # once it has committed the retry sees its like and takes it back
+            with transaction.atomic():
+                cursor.execute(get_toggle_query(entity), params)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+    exists, like_id, likes_count = cursor.fetchone()
+    cursor.close()
 
-    if res is None:
-        cursor.close()
-        return I_CODE_UNKNOWN_ENTITY, None
-    elif res[1] is not None:
-        cursor.execute(LIKES_QUERY.format(entity, entity_id))
-        res = cursor.fetchone()
-        return I_CODE_ALREADY_VOTED, res
+    if not exists:
+        return None
+    if COUNTERS_BUFFERED:
+        likes_count = increment(entity, entity_id, 'likes_count', 1 if like_id else -1)
+    return like_id, likes_count
+
+
+def get_toggle_many_query(entity, entity_ids):
+    fields = ['likes_count', 'popularity'] if entity == 'question' else ['likes_count']
+    if COUNTERS_BUFFERED:
+        # deltas written by the statement are not visible to it yet, the toggle is added by hand
+        counted = TOGGLE_MANY_DELTAS.format('\n                        UNION ALL\n                        '.join(
+            ["SELECT '{0}', id, '{1}', {2}, now() FROM entity".format(entity, field, TOGGLE_MANY_DELTA)
+             for field in fields]))
+        likes_count = "d_{0}.likes_count + ".format(entity) + \
+                      pending(entity, 'entity.id', 'likes_count') + \
+                      " + CASE WHEN inserted.like_id IS NULL THEN -1 ELSE 1 END"
+        join = ""
     else:
-        cursor.close()
-        return I_CODE_VOTE_OK, None
+        counted = TOGGLE_MANY_COUNT_QUERY.format(entity, ', '.join(['{0} = {0} + '.format(field) + TOGGLE_MANY_DELTA
+                                                                    for field in fields]))
+        likes_count = "counted.likes_count"
+        join = "\n                         LEFT JOIN counted ON counted.id = entity.id"
+
+    question_id = 'id' if entity == 'question' else 'question_id'
+    entity_ids = ', '.join([str(int(x)) for x in entity_ids])
+    if entity == 'question':
+        return TOGGLE_MANY_QUERY.format(entity, question_id, entity_ids, '', '', counted, likes_count, join)
+    return TOGGLE_MANY_QUERY.format(entity, question_id, entity_ids, ', creation_date', ', now()', counted,
+                                    likes_count, join)
+
 
+def toggle_likes(entity, entity_ids, user_id):
+    """
+    Toggles the likes of the user on a set of entities of one kind in one statement.
+    Returns {entity_id: (like_id, likes_count, question_id)} for the entities that exist.
+    """
+    if not entity_ids:
+        return {}
 
-def insert_vote(entity, entity_id, user_id):
     cursor = connection.cursor()
 
-    if entity == 'question':
-        cursor.execute(INSERT_QUESTION_QUERY.format(user_id, entity_id))
-    else:
-        from decider_app.models import CommentLike
-        CommentLike.objects.create(user_id=user_id, comment_id=entity_id)
-    cursor.execute(ENTITY_UPDATE_QUERY.format(entity, entity_id, "+"))
-    cursor.execute(LIKES_QUERY.format(entity, entity_id))
-    res = cursor.fetchone()
+    for attempt in range(2):
+        try:
+            # same retry as toggle_like, once a concurrent toggle has committed its like is taken back
+            with transaction.atomic():
+                cursor.execute(get_toggle_many_query(entity, entity_ids), {'user_id': int(user_id)})
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+    res = dict((row[0], (row[2], row[3], row[1])) for row in cursor.fetchall())
     cursor.close()
 
     return res
 
 
-def delete_vote(entity, entity_id, user_id):
+def get_user_likes(entity, entity_ids, user_id):
+    if not entity_ids:
+        return set()
+
     cursor = connection.cursor()
 
-    cursor.execute(DELETE_QUERY.format(entity, user_id, entity_id))
-    cursor.execute(ENTITY_UPDATE_QUERY.format(entity, entity_id, "-"))
-    cursor.execute(LIKES_QUERY.format(entity, entity_id))
-    res = cursor.fetchone()
+    entity_ids = ', '.join([str(x) for x in entity_ids])
+    cursor.execute(USER_LIKES_QUERY.format(entity, user_id, entity_ids))
+    res = set(row[0] for row in cursor.fetchall())
     cursor.close()
 
-    return res
\ No newline at end of file
+    return res
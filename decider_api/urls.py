@@ -1,7 +1,9 @@
 from django.conf.urls import url, patterns, include
 from decider_api.views import auth_views, temp_views
+from decider_api.views.batch_views import BatchEndpoint
 from decider_api.views.category_views import CategoriesEndpoint
 from decider_api.views.comment_views import CommentsEndpoint
+from decider_api.views.event_views import QuestionEventsEndpoint
 from decider_api.views.image_views import ImagesEndpoint
 from decider_api.views.poll_views import PollEndpoint
 from decider_api.views.question_views import QuestionsEndpoint, QuestionDetailsEndpoint
@@ -9,7 +11,7 @@ from decider_api.views.share_views import ShareEndpoint
 from decider_api.views.user_data_views import UserDataEndpoint
 from decider_api.views.views import SpamEndpoint
 from decider_api.views.vote_views import VoteEndpoint
-from decider_backend.settings import TEMP_URLS
+from decider_backend.settings import TEMP_URLS, EVENTS_ENABLED
 
 urlpatterns = patterns('',
     url(r'^social/', include('social.apps.django_app.urls', namespace='social')),
@@ -31,6 +33,7 @@ urlpatterns = patterns('',
     url(r'^categories/?$', CategoriesEndpoint.as_view(), name="categories"),
     url(r'^comments/?$', CommentsEndpoint.as_view(), name="comments"),
     url(r'^vote/?$', VoteEndpoint.as_view(), name="vote"),
+    url(r'^batch/?$', BatchEndpoint.as_view(), name="batch"),
 
     url(r'^spam/?$', SpamEndpoint.as_view(), name="spam"),
     # url(r'^share/?$', ShareEndpoint.as_view(), name="share"),
@@ -38,6 +41,11 @@ urlpatterns = patterns('',
     url(r'^logout/?$', auth_views.logout_view, name="logout_view"),
 )
 
+if EVENTS_ENABLED:
+    urlpatterns += (
+        url(r'^questions/(?P<question_id>[0-9]+)/events/?$', QuestionEventsEndpoint.as_view(), name="question_events"),
+    )
+
 if TEMP_URLS:
     urlpatterns += (
         url(r'^tmp/send_push/?$', temp_views.send_push, name="send_push"),
@@ -45,4 +53,5 @@ if TEMP_URLS:
         # url(r'^tmp/fill_db/?$', temp_views.fill_db, name="fill_db"),
         url(r'^tmp/delete_entity/?$', temp_views.delete_entity, name="delete_question"),
         url(r'^tmp/clear_notification_history/?$', temp_views.clear_notification_history),
+        url(r'^tmp/feed_stats/?$', temp_views.feed_stats, name="feed_stats"),
     )
\ No newline at end of file
@@ -0,0 +1,161 @@
+import hashlib
+import time
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = 'feed:generation'
+FEED_PAGE_KEY = 'feed:page:{0}:{1}'
+FEED_QUESTION_KEY = 'feed:question:{0}'
+FEED_VIEWER_KEY = 'feed:viewer:{0}:{1}'
+FEED_VIEWER_VERSION_KEY = 'feed:viewer_version:{0}'
+FEED_PREFETCH_KEY = 'feed:prefetch:{0}:{1}:{2}'
+FEED_PREFETCH_LOCK_KEY = 'feed:prefetch_lock:{0}'
+FEED_PREFETCH_STATS_KEY = 'feed:prefetch_stats:{0}'
+COMMENTS_VERSION_KEY = 'comments:version:{0}'
+COMMENTS_PAGE_KEY = 'comments:page:{0}:{1}:{2}'
+
+FEED_PAGE_TTL = 30          # seconds, popular and hot orderings drift with every vote
+FEED_QUESTION_TTL = 600
+FEED_VIEWER_TTL = 600
+FEED_PREFETCH_TTL = 60
+FEED_PREFETCH_LOCK_TTL = 10
+COMMENTS_PAGE_TTL = 300     # comment writes bump the version, this bounds author profile changes
+
+
+def get_feed_generation():
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        # start from the clock so an evicted counter never brings back old pages
+        generation = int(time.time() * 1000)
+        cache.add(FEED_GENERATION_KEY, generation, None)
+        generation = cache.get(FEED_GENERATION_KEY, generation)
+    return generation
+
+
+def get_page_id(**params):
+    return hashlib.md5(repr(sorted(params.items()))).hexdigest()
+
+
+def get_feed_page_key(**params):
+    return FEED_PAGE_KEY.format(get_feed_generation(), get_page_id(**params))
+
+
+def get_feed_page(key):
+    return cache.get(key)
+
+
+def set_feed_page(key, q_ids, next_cursor):
+    cache.set(key, {'ids': q_ids, 'next_cursor': next_cursor}, FEED_PAGE_TTL)
+
+
+def get_feed_questions(q_ids):
+    cached = cache.get_many([FEED_QUESTION_KEY.format(q_id) for q_id in q_ids])
+    return dict((question['id'], question) for question in cached.values())
+
+
+def set_feed_questions(questions):
+    cache.set_many(dict((FEED_QUESTION_KEY.format(question['id']), question) for question in questions),
+                   FEED_QUESTION_TTL)
+
+
+def get_viewer_flags(user_id, q_ids):
+    keys = dict((FEED_VIEWER_KEY.format(user_id, q_id), q_id) for q_id in q_ids)
+    cached = cache.get_many(keys.keys())
+    return dict((keys[key], flags) for key, flags in cached.items())
+
+
+def set_viewer_flags(user_id, flags):
+    cache.set_many(dict((FEED_VIEWER_KEY.format(user_id, q_id), value) for q_id, value in flags.items()),
+                   FEED_VIEWER_TTL)
+
+
+def get_viewer_version(user_id):
+    return cache.get(FEED_VIEWER_VERSION_KEY.format(user_id), 0)
+
+
+def get_feed_prefetch_key(user_id, **params):
+    # prefetched pages carry the viewer flags, so they expire with any of the viewer's votes
+    page_id = get_page_id(generation=get_feed_generation(), **params)
+    return FEED_PREFETCH_KEY.format(user_id, get_viewer_version(user_id), page_id)
+
+
+def get_prefetched_page(key):
+    return cache.get(key)
+
+
+def set_prefetched_page(key, data, next_cursor):
+    cache.set(key, {'data': data, 'next_cursor': next_cursor}, FEED_PREFETCH_TTL)
+
+
+def lock_prefetch(key):
+    return cache.add(FEED_PREFETCH_LOCK_KEY.format(key), True, FEED_PREFETCH_LOCK_TTL)
+
+
+def count_prefetch(result):
+    key = FEED_PREFETCH_STATS_KEY.format(result)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_prefetch_stats():
+    stats = cache.get_many([FEED_PREFETCH_STATS_KEY.format(result) for result in ('hit', 'miss')])
+    return {
+        'hits': stats.get(FEED_PREFETCH_STATS_KEY.format('hit'), 0),
+        'misses': stats.get(FEED_PREFETCH_STATS_KEY.format('miss'), 0)
+    }
+
+
+# the invalidate functions are called after the write commits: a reader missing the
+# cache before the commit would store the old rows again, under the new version
+def invalidate_feed():
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        get_feed_generation()
+
+
+def invalidate_questions(q_ids):
+    cache.delete_many([FEED_QUESTION_KEY.format(q_id) for q_id in q_ids])
+
+
+def invalidate_question(q_id):
+    invalidate_questions([q_id])
+
+
+def invalidate_viewer(user_id, q_id):
+    cache.delete(FEED_VIEWER_KEY.format(user_id, q_id))
+    try:
+        cache.incr(FEED_VIEWER_VERSION_KEY.format(user_id))
+    except ValueError:
+        cache.set(FEED_VIEWER_VERSION_KEY.format(user_id), 1, None)
+
+
+def get_comments_version(q_id):
+    key = COMMENTS_VERSION_KEY.format(q_id)
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def get_comments_page_key(q_id, **params):
+    return COMMENTS_PAGE_KEY.format(q_id, get_comments_version(q_id), get_page_id(**params))
+
+
+def get_comments_page(key):
+    return cache.get(key)
+
+
+def set_comments_page(key, rows):
+    cache.set(key, rows, COMMENTS_PAGE_TTL)
+
+
+def invalidate_comments(q_id):
+    try:
+        cache.incr(COMMENTS_VERSION_KEY.format(q_id))
+    except ValueError:
+        get_comments_version(q_id)
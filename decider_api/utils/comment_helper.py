@@ -0,0 +1,104 @@
+from decider_api.db.comments import get_comments
+from decider_api.db.counters import add_pending
+from decider_api.db.vote import get_user_likes
+from decider_api.utils import cache_helper
+from decider_api.utils.cursor_helper import encode_cursor, decode_cursor
+from decider_api.utils.helper import get_short_user_row_data
+
+DEFAULT_LIMIT = 30
+
+# request order -> comments query direction
+ORDERS = {
+    'creation_date': 'asc',
+    '-creation_date': 'desc'
+}
+DEFAULT_ORDER = '-creation_date'
+
+
+def get_comment_row_data(comment_row, user_id, voted=False):
+    is_anonymous = comment_row['is_anonymous']
+    force_deanon = True if int(comment_row['author_id']) == user_id else False
+    return {
+        'id': comment_row['id'],
+        'text': comment_row['text'],
+        'creation_date': comment_row['creation_date'],
+        'likes_count': comment_row['likes_count'],
+        'author': get_short_user_row_data(comment_row, 'author', is_anonymous, force_deanon),
+        'voted': voted,
+        'is_anonymous': is_anonymous,
+        'question_id': comment_row['question_id']
+    }
+
+
+def get_comment_rows(q_id, **params):
+    """
+    Reads comment rows through the per-question page cache. The rows are the same
+    for every viewer, the key carries the question's comments version, which every
+    comment write bumps.
+    """
+    key = cache_helper.get_comments_page_key(q_id, **params)
+    comments_list = cache_helper.get_comments_page(key)
+    if comments_list is None:
+        comments_list = get_comments(q_id, **params)
+        cache_helper.set_comments_page(key, comments_list)
+    return comments_list
+
+
+def render_comments(comments_list, user_id):
+    add_pending('comment', comments_list, ['likes_count'])
+    likes = get_user_likes('comment', [comment_row['id'] for comment_row in comments_list], user_id)
+    return [get_comment_row_data(comment_row, user_id, comment_row['id'] in likes) for comment_row in comments_list]
+
+
+def get_comments_page(user_id, q_id, comments_count, order=DEFAULT_ORDER, limit=DEFAULT_LIMIT,
+                      offset=None, cursor=None):
+    """
+    Fetches one page of the active comments of a question with the count of the
+    comments after it. Cursor pages continue from the last comment served along
+    the (question_id, is_active, creation_date, id) index instead of skipping rows
+    with OFFSET, and carry the number of comments served so far for the count.
+    Raises InvalidCursor for a cursor issued for another order.
+    """
+    direction = ORDERS[order]
+    tab = 'comments_' + direction
+
+    after = None
+    served = int(offset) if offset else 0
+    if cursor:
+        creation_date, comment_id, served = decode_cursor(cursor, tab, date_key=True, with_offset=True)
+        after = (creation_date, comment_id)
+
+    comments_list = get_comment_rows(q_id, order=direction, limit=int(limit),
+                                     offset=int(offset) if offset and not after else None, after=after)
+    served += len(comments_list)
+
+    remaining = comments_count - served if comments_list else 0
+    remaining = remaining if remaining >= 0 else 0
+
+    next_cursor = None
+    if comments_list and remaining and len(comments_list) == int(limit):
+        last = comments_list[-1]
+        next_cursor = encode_cursor(tab, last['creation_date'], last['id'], offset=served)
+
+    return {
+        'comments': render_comments(comments_list, user_id),
+        'remaining': remaining,
+        'next_cursor': next_cursor
+    }
+
+
+def get_comments_by_id(user_id, q_id, since_id=None, before_id=None, limit=DEFAULT_LIMIT):
+    """
+    Fetches the comments posted after since_id, oldest first, or the comments
+    before before_id, newest first, reading only the rows past the given id.
+    A client polling an open thread keeps passing the last id it has seen.
+    """
+    order = 'id_asc' if before_id is None else 'id_desc'
+    comments_list = get_comment_rows(q_id, order=order, limit=int(limit),
+                                     since_id=int(since_id) if since_id else None,
+                                     before_id=int(before_id) if before_id else None)
+
+    return {
+        'comments': render_comments(comments_list, user_id),
+        'has_more': len(comments_list) == int(limit)
+    }
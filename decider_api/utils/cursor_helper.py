@@ -0,0 +1,39 @@
+import base64
+import json
+import dateutil.parser
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(tab, key, entity_id, offset=None):
+    if hasattr(key, 'isoformat'):
+        key = key.isoformat()
+    data = {'t': tab, 'k': key, 'id': entity_id}
+    if offset is not None:
+        data['o'] = offset
+    data = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def decode_cursor(cursor, tab, date_key=False, with_offset=False):
+    try:
+        cursor = str(cursor)
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if data['t'] != tab:
+            raise InvalidCursor(cursor)
+
+        key = data['k']
+        if date_key:
+            key = dateutil.parser.parse(key)
+        elif not isinstance(key, (int, long, float)):
+            raise InvalidCursor(cursor)
+
+        if with_offset:
+            return key, int(data['id']), int(data.get('o', 0))
+        return key, int(data['id'])
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor(cursor)
@@ -0,0 +1,71 @@
+from collections import deque, OrderedDict
+import threading
+import time
+from decider_backend.settings import EVENTS_ENABLED
+
+EVENTS_HISTORY = 100            # events kept per question for clients catching up
+EVENTS_MAX_QUESTIONS = 10000    # questions with a history, least recently published are dropped first
+
+
+class EventBroker(object):
+    """
+    In-process publish/subscribe for question events. Waiting clients block on a
+    condition until an event newer than the last one they have seen is published.
+
+    This is a local stand-in for a real broker: only requests served by the same
+    process see the events, so the write paths and the events endpoint have to run
+    in one process (a threaded worker) until it is backed by a shared broker.
+    """
+
+    def __init__(self, history=EVENTS_HISTORY, max_questions=EVENTS_MAX_QUESTIONS):
+        self.history = history
+        self.max_questions = max_questions
+        self._condition = threading.Condition()
+        self._events = OrderedDict()
+        self._last_id = 0
+
+    def last_event_id(self):
+        with self._condition:
+            return self._last_id
+
+    def publish(self, q_id, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            events = self._events.pop(q_id, None)
+            if events is None:
+                events = deque(maxlen=self.history)
+                if len(self._events) >= self.max_questions:
+                    self._events.popitem(last=False)
+            self._events[q_id] = events
+            events.append({'id': self._last_id, 'type': event_type, 'data': data})
+            self._condition.notify_all()
+
+    def _get_events(self, q_id, last_event_id):
+        if last_event_id > self._last_id:
+            # the id was issued before this process restarted, replay what is kept
+            last_event_id = 0
+        return [event for event in self._events.get(q_id, ()) if event['id'] > last_event_id]
+
+    def wait(self, q_id, last_event_id, timeout):
+        """
+        Returns the events of the question published after last_event_id,
+        blocking for up to timeout seconds while there are none.
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            events = self._get_events(q_id, last_event_id)
+            while not events:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                events = self._get_events(q_id, last_event_id)
+            return events
+
+
+broker = EventBroker()
+
+
+def publish(q_id, event_type, data):
+    if EVENTS_ENABLED:
+        broker.publish(int(q_id), event_type, data)
@@ -0,0 +1,166 @@
+import json
+from decider_api.db.poll import get_user_votes
+from decider_api.db.poll_items import get_poll_items
+from decider_api.db.questions import tab_switch, get_next_cursor, get_questions_by_ids
+from decider_api.db.vote import get_user_likes
+from decider_api.utils import cache_helper
+from decider_api.utils.helper import get_short_user_row_data, get_anonymous_user_data
+from decider_backend.settings import FEED_AGGREGATE_POLL_ITEMS
+
+
+def build_feed_questions(question_list):
+    polls = []
+    for question_row in question_list:
+        poll_id = question_row['poll_id']
+        if poll_id and 'poll_items' not in question_row:
+            polls.append(poll_id)
+
+    poll_items_list = get_poll_items(polls) if polls else []
+
+    poll_items = {}
+    for poll_item_row in poll_items_list:
+        q_id = poll_item_row['question_id']
+        pi = {
+            'id': poll_item_row['id'],
+            'text': poll_item_row['text'],
+            'image_url': poll_item_row['image_url'],
+            'preview_url': poll_item_row['preview_url'],
+            'renditions': json.loads(poll_item_row['renditions']) if poll_item_row['renditions'] else None,
+            'votes_count': poll_item_row['votes_count'],
+        }
+
+        if not poll_items.get(q_id):
+            poll_items[q_id] = []
+        poll_items[q_id].append(pi)
+
+    questions = []
+    for question_row in question_list:
+        q_id = question_row['id']
+        if 'poll_items' in question_row:
+            poll = question_row['poll_items']
+        else:
+            poll = poll_items.get(q_id)
+            if poll:
+                poll = sorted(poll, key=lambda k: k['id'])
+
+        questions.append({
+            'id': q_id,
+            'text': question_row['text'],
+            'creation_date': question_row['creation_date'],
+            'category_id': question_row['category_id'],
+            'likes_count': question_row['likes_count'],
+            'comments_count': question_row['comments_count'],
+            'author': get_short_user_row_data(question_row, 'author', force_deanon=True),
+            'poll': poll,
+            'is_anonymous': question_row['is_anonymous'],
+            'author_id': int(question_row['author_id']),
+            'author_anonymous': question_row['author_anonymous'],
+            'poll_id': question_row['poll_id'],
+        })
+
+    return questions
+
+
+def load_viewer_flags(user_id, questions):
+    """
+    Fetches the likes and poll votes of a user for the given questions,
+    which keeps the question queries themselves viewer independent.
+    """
+    likes = get_user_likes('question', [q['id'] for q in questions], user_id)
+    votes = get_user_votes(user_id, [q['poll_id'] for q in questions if q['poll_id']])
+
+    flags = {}
+    for question in questions:
+        flags[question['id']] = {
+            'voted': question['id'] in likes,
+            'poll_item_id': votes.get(question['poll_id'])
+        }
+    return flags
+
+
+def render_feed_question(question, flags, user_id, force_deanon=False):
+    data = dict(question)
+    author_id = data.pop('author_id')
+    author_anonymous = data.pop('author_anonymous')
+    data.pop('poll_id')
+
+    if (data['is_anonymous'] or author_anonymous) and not (force_deanon or author_id == user_id):
+        data['author'] = get_anonymous_user_data()
+
+    if data['poll']:
+        data['poll'] = [dict(pi, voted=pi['id'] == flags['poll_item_id']) for pi in data['poll']]
+    data['voted'] = flags['voted']
+
+    return data
+
+
+def pick_rendition(renditions, width, image_format):
+    """
+    The smallest rendition of the format at least width pixels wide, the largest
+    one when none is. Width None picks the largest one.
+    """
+    renditions = sorted([r for r in renditions if r['format'] == image_format], key=lambda r: r['width'])
+    if not renditions:
+        return None
+    for rendition in renditions:
+        if width is not None and rendition['width'] >= width:
+            return rendition
+    return renditions[-1]
+
+
+def select_renditions(questions, width=None, webp=False):
+    """
+    Points the image urls of rendered feed questions at the rendition that fits
+    an image slot width pixels wide, WebP when the client takes it and there is one.
+    """
+    for question in questions:
+        for pi in question['poll'] or []:
+            renditions = pi.pop('renditions', None)
+            if not renditions or width is None:
+                continue
+            rendition = (webp and pick_rendition(renditions, width, 'webp')) or \
+                pick_rendition(renditions, width, 'jpeg')
+            if rendition:
+                pi['image_url'] = rendition['url']
+                pi['image_width'] = rendition['width']
+                pi['image_height'] = rendition['height']
+    return questions
+
+
+def get_feed(user_id, tab, **kwargs):
+    key = cache_helper.get_feed_page_key(tab=tab, owner=user_id if tab == 'my' else None,
+                                         limit=kwargs.get('limit'), offset=kwargs.get('offset'),
+                                         cursor=kwargs.get('cursor'),
+                                         categories=sorted(kwargs.get('categories') or []),
+                                         first_question_id=kwargs.get('first_question_id'))
+    page = cache_helper.get_feed_page(key)
+
+    if page is None:
+        question_list = tab_switch(tab)(user_id=user_id, with_poll_items=FEED_AGGREGATE_POLL_ITEMS, **kwargs)
+        built = build_feed_questions(question_list)
+        page = {
+            'ids': [question['id'] for question in built],
+            'next_cursor': get_next_cursor(tab, question_list, kwargs.get('limit'))
+        }
+        cache_helper.set_feed_page(key, page['ids'], page['next_cursor'])
+        cache_helper.set_feed_questions(built)
+        questions = dict((question['id'], question) for question in built)
+    else:
+        questions = cache_helper.get_feed_questions(page['ids'])
+        missing = [q_id for q_id in page['ids'] if q_id not in questions]
+        if missing:
+            question_list = get_questions_by_ids(missing, with_poll_items=FEED_AGGREGATE_POLL_ITEMS)
+            built = build_feed_questions(question_list)
+            cache_helper.set_feed_questions(built)
+            questions.update((question['id'], question) for question in built)
+
+    flags = cache_helper.get_viewer_flags(user_id, [q_id for q_id in page['ids'] if q_id in questions])
+    missing = [questions[q_id] for q_id in page['ids'] if q_id in questions and q_id not in flags]
+    if missing:
+        loaded = load_viewer_flags(user_id, missing)
+        cache_helper.set_viewer_flags(user_id, loaded)
+        flags.update(loaded)
+
+    data = [render_feed_question(questions[q_id], flags[q_id], user_id, force_deanon=tab == 'my')
+            for q_id in page['ids'] if q_id in questions]
+    return data, page['next_cursor']
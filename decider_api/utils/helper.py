@@ -12,16 +12,20 @@ def str2bool(v):
     else:
         return v.lower() in ("yes", "true", "t", "1")
 
+def get_anonymous_user_data():
+    return {
+        'uid': 'anonymous',
+        "username": 'anonymous',
+        "last_name": 'anonymous',
+        "first_name": 'anonymous',
+        "middle_name": 'anonymous',
+        "avatar": None
+    }
+
+
 def get_short_user_data(user, is_anonymous=False, force_deanon=False):
     if (is_anonymous or user.is_anonymous) and not force_deanon:
-        return {
-            'uid': 'anonymous',
-            "username": 'anonymous',
-            "last_name": 'anonymous',
-            "first_name": 'anonymous',
-            "middle_name": 'anonymous',
-            "avatar": None
-        }
+        return get_anonymous_user_data()
     else:
         return {
             'uid': user.uid,
@@ -33,24 +37,17 @@ def get_short_user_data(user, is_anonymous=False, force_deanon=False):
         }
 
 
-def get_short_user_row_data(row, columns, prefix, is_anonymous=False, force_deanon=False):
-    if (is_anonymous or row[columns.index(prefix + '_anonymous')]) and not force_deanon:
-        return {
-            'uid': 'anonymous',
-            "username": 'anonymous',
-            "last_name": 'anonymous',
-            "first_name": 'anonymous',
-            "middle_name": 'anonymous',
-            "avatar": None
-        }
+def get_short_user_row_data(row, prefix, is_anonymous=False, force_deanon=False):
+    if (is_anonymous or row[prefix + '_anonymous']) and not force_deanon:
+        return get_anonymous_user_data()
     else:
         return {
-            'uid': row[columns.index(prefix + '_uid')],
-            'username': row[columns.index(prefix + '_username')],
-            'first_name': row[columns.index(prefix + '_first_name')],
-            'last_name': row[columns.index(prefix + '_last_name')],
-            'middle_name': row[columns.index(prefix + '_middle_name')],
-            'avatar': row[columns.index(prefix + '_image_url')]
+            'uid': row[prefix + '_uid'],
+            'username': row[prefix + '_username'],
+            'first_name': row[prefix + '_first_name'],
+            'last_name': row[prefix + '_last_name'],
+            'middle_name': row[prefix + '_middle_name'],
+            'avatar': row[prefix + '_image_url']
         }
 
 
@@ -1,65 +1,288 @@
 from PIL import Image
+import hashlib
 import httplib
+import json
 import os
+import threading
 import uuid
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 from django.utils import timezone
+from decider_api.db.stored_images import find_images, store_images, acquire_images
 from decider_api.log_manager import logger
 from decider_app.views.utils.response_codes import CODE_IMAGE_UPLOAD_FAILED, CODE_BAD_IMAGE
-from decider_backend.settings import MEDIA_ROOT
+from decider_backend.settings import MEDIA_ROOT, IMAGES_CONCURRENT, IMAGE_WORKERS, IMAGES_WEBP
 
 
 SHARE_SIZE = (1400, 2000)
 IMAGE_SIZE = (720, 1280)
 PREVIEW_SIZE = (720, 1280)
 
+# smaller sizes a poll image is also saved in, the full size being IMAGE_SIZE
+RENDITIONS = [(240, 427), (480, 854)]
 
-def upload_image(image, preview=None, upload_to='misc'):
+PREVIEW_OUTPUTS = [(PREVIEW_SIZE, '', 'JPEG', 95)]
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+CHUNK_SIZE = 64 * 1024
 
-    response = {}
+# raw uploads waiting for the image worker, relative to MEDIA_ROOT
+STAGING_DIR = 'uploads'
 
+
+def stage_upload(upload, upload_to='misc'):
+    """
+    Writes an uploaded file as is for the image worker to process later.
+    Returns its path relative to MEDIA_ROOT, None if it could not be written.
+    """
     cur_time = timezone.now().strftime('%s')
-    uid = uuid.uuid4().hex
-    filename = uid + '.jpg'
-    dirname = os.path.join('images', upload_to, cur_time[:5], cur_time[5:6])
-    url = os.path.join(dirname, filename)
+    dirname = os.path.join(STAGING_DIR, upload_to, cur_time[:5], cur_time[5:6])
+    path = os.path.join(dirname, uuid.uuid4().hex)
 
     try:
         if not os.path.exists(os.path.join(MEDIA_ROOT, dirname)):
             os.makedirs(os.path.join(MEDIA_ROOT, dirname))
+        with open(os.path.join(MEDIA_ROOT, path), 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+    except Exception as e:
+        logger.exception(e)
+        return None
+
+    return path
+
+
+def remove_staged(path):
+    try:
+        os.remove(os.path.join(MEDIA_ROOT, path))
+    except OSError as e:
+        logger.warning("Failed to remove staged upload " + path + ": " + str(e))
+
+
+Image.init()
+# Pillow built without libwebp cannot save WebP, those renditions are skipped then
+WEBP_SUPPORTED = 'WEBP' in Image.SAVE
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process-wide pool the images are resized in. Pillow releases the GIL while
+    it decodes, resamples and encodes, so the threads run on separate cores.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        # threads do not survive a fork, a worker forked off a preloaded master starts its own pool
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPool(IMAGE_WORKERS)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def load_resized(source, size, draft=True):
+    """
+    Opens an image scaled down to fit in size. JPEGs are decoded right at the
+    largest DCT scale (1/2, 1/4 or 1/8) that still covers the target, so a 12MP
+    photo is never decoded in full, and the rest is resampled with Lanczos.
+    """
+    img = Image.open(source)
+    target = get_fit_size(img.size, size)
+    if target is None:
+        return img
+
+    if draft and img.format == 'JPEG':
+        img.draft(img.mode, target)
+    return img.resize(target, Image.LANCZOS)
+
+
+def get_fit_size(image_size, size):
+    resize_scale = max(float(image_size[0])/size[0], float(image_size[1])/size[1])
+    if resize_scale <= 1:
+        return None
+    return int(image_size[0]/resize_scale), int(image_size[1]/resize_scale)
+
+
+def fit(img, size):
+    target = get_fit_size(img.size, size)
+    return img.resize(target, Image.LANCZOS) if target else img
+
+
+def resize_image(job):
+    """
+    Decodes a source once and saves it in every (size, path, format, quality) of
+    the job, largest size first. Returns the sizes saved, None for a bad image.
+    """
+    source, outputs = job
+    try:
+        img = load_resized(source, outputs[0][0])
+        sizes = []
+        resized = {}
+        for size, path, image_format, quality in outputs:
+            if size not in resized:
+                resized[size] = fit(img, size)
+            resized[size].save(os.path.join(MEDIA_ROOT, path), image_format, quality=quality)
+            sizes.append(resized[size].size)
+    except Exception as e:
+        logger.exception(e)
+        return None
+    return sizes
+
+
+def get_outputs(renditions=False):
+    """
+    The (size, suffix, format, quality) of every file an image is saved in, largest first.
+    """
+    outputs = [(IMAGE_SIZE, '', 'JPEG', 95)]
+    if renditions:
+        outputs.extend((size, '_{0}'.format(size[0]), 'JPEG', 85) for size in reversed(RENDITIONS))
+        if IMAGES_WEBP and WEBP_SUPPORTED:
+            outputs.extend((size, '_{0}'.format(size[0]) if size != IMAGE_SIZE else '', 'WEBP', 80)
+                           for size in [IMAGE_SIZE] + list(reversed(RENDITIONS)))
+    return outputs
+
+
+def get_key(source, upload_to, outputs):
+    """
+    Content address of an image: the sha256 of its bytes and of what they are
+    processed into, so the same upload processed differently is stored apart.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, basestring):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        source.seek(0)
+    digest.update(upload_to + repr(outputs))
+    return digest.hexdigest()
+
+
+def get_paths(key, upload_to, outputs):
+    dirname = os.path.join('images', upload_to, key[:2], key[2:4])
+    return dirname, [os.path.join(dirname, key + suffix + EXTENSIONS[image_format])
+                     for size, suffix, image_format, quality in outputs]
+
+
+def get_renditions(data):
+    """
+    The renditions of an upload_images response with the media urls Picture
+    keeps, JSON encoded for Picture.renditions, the full size JPEG included.
+    """
+    renditions = [dict(rendition, url=os.path.join('media', rendition['url']))
+                  for rendition in data.get('renditions', [])]
+    return json.dumps(renditions) if renditions else None
+
+
+def upload_images(items, upload_to='misc', concurrent=None, renditions=False, dedup=True):
+    """
+    Resizes and saves a list of (image, preview) pairs, all files at once in the
+    image pool when concurrent (IMAGES_CONCURRENT by default). Returns a response
+    per pair in the form upload_image returns it. With renditions the image is
+    also saved in the smaller sizes of RENDITIONS, and as WebP when IMAGES_WEBP
+    is on, listed in the response as renditions.
+
+    Files are stored by content: bytes stored before are found by their key
+    and not decoded again, and the response points at the stored files.
+    Without dedup everything is processed again, which only benchmarks want.
+    """
+    if concurrent is None:
+        concurrent = IMAGES_CONCURRENT
+
+    image_outputs = get_outputs(renditions)
+    try:
+        keys = [(get_key(image, upload_to, image_outputs),
+                 get_key(preview, upload_to, PREVIEW_OUTPUTS) if preview else None)
+                for image, preview in items]
+        stored = find_images([key for pair in keys for key in pair if key]) if dedup else {}
     except Exception as e:
         logger.exception(e)
-        response['error'] = (httplib.INTERNAL_SERVER_ERROR, CODE_IMAGE_UPLOAD_FAILED, 'Image upload failed')
-        return response
+        return [{'error': (httplib.INTERNAL_SERVER_ERROR, CODE_IMAGE_UPLOAD_FAILED, 'Image upload failed')}
+                for item in items]
+
+    # one job per new key, however many times its bytes come up in the batch
+    jobs = OrderedDict()
+    for (image, preview), (image_key, preview_key) in zip(items, keys):
+        for source, key, outputs in [(image, image_key, image_outputs), (preview, preview_key, PREVIEW_OUTPUTS)]:
+            if key and key not in stored and key not in jobs:
+                dirname, paths = get_paths(key, upload_to, outputs)
+                jobs[key] = (dirname, (source, [(size, path, image_format, quality)
+                                                for (size, suffix, image_format, quality), path
+                                                in zip(outputs, paths)]))
 
     try:
-        img = Image.open(image)
-        resize_scale = max(float(img.size[0])/IMAGE_SIZE[0], float(img.size[1])/IMAGE_SIZE[1])
-        if resize_scale > 1:
-            img = img.resize((int(img.size[0]/resize_scale), int(img.size[1]/resize_scale)))
-        img.save(os.path.join(MEDIA_ROOT, url), 'JPEG', quality=95)
+        for dirname, job in jobs.values():
+            if not os.path.exists(os.path.join(MEDIA_ROOT, dirname)):
+                os.makedirs(os.path.join(MEDIA_ROOT, dirname))
     except Exception as e:
         logger.exception(e)
-        response['error'] = (httplib.BAD_REQUEST, CODE_BAD_IMAGE, 'Bad image')
-        return response
-
-    if preview:
-        preview_filename = uid + '_preview.jpg'
-        preview_url = os.path.join(dirname, preview_filename)
-
-        try:
-            preview = Image.open(preview)
-            resize_scale = max(float(preview.size[0])/PREVIEW_SIZE[0], float(preview.size[1])/PREVIEW_SIZE[1])
-            if resize_scale > 1:
-                preview = preview.resize((int(preview.size[0]/resize_scale), int(preview.size[1]/resize_scale)))
-            preview.save(os.path.join(MEDIA_ROOT, preview_url), 'JPEG', quality=95)
-        except Exception as e:
-            logger.exception(e)
-            response['error'] = (httplib.BAD_REQUEST, CODE_BAD_IMAGE, 'Bad preview')
-            return response
-
-    response['data'] = {
-        'image_url': url,
-        'preview_url': preview_url if preview else None,
-        'uid': uid
-    }
-    return response
\ No newline at end of file
+        return [{'error': (httplib.INTERNAL_SERVER_ERROR, CODE_IMAGE_UPLOAD_FAILED, 'Image upload failed')}
+                for item in items]
+
+    job_list = [job for dirname, job in jobs.values()]
+    if concurrent and len(job_list) > 1:
+        done = get_pool().map(resize_image, job_list)
+    else:
+        done = map(resize_image, job_list)
+
+    processed = []
+    for key, (source, outputs), sizes in zip(jobs.keys(), job_list, done):
+        if sizes is None:
+            continue
+        rendition_list = None
+        if len(outputs) > 1:
+            rendition_list = json.dumps([
+                {'width': size[0], 'height': size[1], 'format': image_format.lower(), 'url': path}
+                for (max_size, path, image_format, quality), size in zip(outputs, sizes)
+            ])
+        processed.append((key, outputs[0][1], rendition_list))
+    stored.update(store_images(processed))
+
+    responses = []
+    for (image, preview), (image_key, preview_key) in zip(items, keys):
+        if image_key not in stored:
+            responses.append({'error': (httplib.BAD_REQUEST, CODE_BAD_IMAGE, 'Bad image')})
+        elif preview and preview_key not in stored:
+            responses.append({'error': (httplib.BAD_REQUEST, CODE_BAD_IMAGE, 'Bad preview')})
+        else:
+            image_row = stored[image_key]
+            preview_row = stored[preview_key] if preview else None
+            data = {
+                'image_url': image_row['url'],
+                'preview_url': preview_row['url'] if preview_row else None,
+                'uid': uuid.uuid4().hex,
+                'image_id': image_row['id'],
+                'preview_id': preview_row['id'] if preview_row else None
+            }
+            if renditions and image_row['renditions']:
+                data['renditions'] = json.loads(image_row['renditions'])
+            responses.append({'data': data})
+
+    return responses
+
+
+def create_picture(data):
+    """
+    Creates the Picture of an upload_images response and counts its
+    references to the stored files.
+    """
+    from decider_app.models import Picture
+
+    picture = Picture.objects.create(url=os.path.join('media', data['image_url']),
+                                     preview_url=os.path.join('media', data['preview_url'])
+                                     if data.get('preview_url') else None,
+                                     renditions=get_renditions(data),
+                                     uid=data['uid'],
+                                     image_id=data.get('image_id'),
+                                     preview_image_id=data.get('preview_id'))
+    acquire_images([picture.image_id, picture.preview_image_id])
+    return picture
+
+
+def upload_image(image, preview=None, upload_to='misc'):
+    return upload_images([(image, preview)], upload_to)[0]
@@ -0,0 +1,89 @@
+from multiprocessing.pool import ThreadPool
+import threading
+from django.db import connection
+from decider_api.log_manager import logger
+from decider_api.utils import cache_helper
+from decider_api.utils.feed_helper import get_feed
+from decider_backend.settings import FEED_PREFETCH_PAGES, FEED_PREFETCH_WORKERS
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(FEED_PREFETCH_WORKERS)
+    return _pool
+
+
+def get_page_params(tab, **kwargs):
+    return {
+        'tab': tab,
+        'limit': kwargs.get('limit'),
+        'offset': kwargs.get('offset'),
+        'cursor': kwargs.get('cursor'),
+        'categories': sorted(kwargs.get('categories') or []),
+        'first_question_id': kwargs.get('first_question_id')
+    }
+
+
+def get_next_page_params(params, data, next_cursor):
+    if not data or not params['limit'] or len(data) < params['limit']:
+        return None
+
+    params = dict(params)
+    if params['cursor'] or not (params['offset'] or params['first_question_id']):
+        if not next_cursor:
+            return None
+        params['cursor'] = next_cursor
+    else:
+        # first_question_id pins the snapshot while the offset grows
+        params['offset'] = (params['offset'] or 0) + params['limit']
+    return params
+
+
+def prefetch_pages(user_id, params, data, next_cursor):
+    try:
+        for i in range(FEED_PREFETCH_PAGES):
+            params = get_next_page_params(params, data, next_cursor)
+            if params is None:
+                return
+
+            key = cache_helper.get_feed_prefetch_key(user_id, **params)
+            page = cache_helper.get_prefetched_page(key)
+            if page is None:
+                if not cache_helper.lock_prefetch(key):
+                    return
+                kwargs = dict(params)
+                data, next_cursor = get_feed(user_id, kwargs.pop('tab'), **kwargs)
+                cache_helper.set_prefetched_page(key, data, next_cursor)
+            else:
+                data, next_cursor = page['data'], page['next_cursor']
+    except Exception as e:
+        logger.exception(e)
+    finally:
+        # pool threads never see request_finished, so their connections are closed here
+        connection.close()
+
+
+def get_feed_page_prefetched(user_id, tab, **kwargs):
+    """
+    Serves a feed page from the pages prefetched for the user when possible
+    and schedules the next FEED_PREFETCH_PAGES pages in the background.
+    """
+    params = get_page_params(tab, **kwargs)
+
+    page = cache_helper.get_prefetched_page(cache_helper.get_feed_prefetch_key(user_id, **params))
+    if page is not None:
+        cache_helper.count_prefetch('hit')
+        data, next_cursor = page['data'], page['next_cursor']
+    else:
+        cache_helper.count_prefetch('miss')
+        data, next_cursor = get_feed(user_id, tab, **kwargs)
+
+    if FEED_PREFETCH_PAGES:
+        get_pool().apply_async(prefetch_pages, (user_id, params, data, next_cursor))
+
+    return data, next_cursor
@@ -1,12 +1,10 @@
 import json
-import os
 import urllib
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.loading import get_model
 import io
 import requests
-from decider_api.utils.image_helper import upload_image
-from decider_app.models import Picture
+from decider_api.utils.image_helper import upload_image, create_picture
 
 
 def get_additional_data(user, access_token):
@@ -37,8 +35,6 @@ def get_additional_data(user, access_token):
         result = upload_image(image_file, preview=None, upload_to='avatars')
         if not result.get('error'):
             data = result.get('data')
-            avatar = Picture.objects.create(url=os.path.join('media', data.get('image_url')),
-                                            uid=data.get('uid'))
-            user.avatar = avatar
+            user.avatar = create_picture(data)
 
     user.save()
@@ -0,0 +1,159 @@
+import httplib
+import json
+from django.db import transaction
+from django.db.models.signals import post_save
+from oauth2_provider.views import ProtectedResourceView
+from decider_api.db.feed_entries import refresh_feed_counters
+from decider_api.db.poll import cast_votes
+from decider_api.db.vote import toggle_likes
+from decider_api.log_manager import logger
+from decider_api.utils import cache_helper, events_helper
+from decider_api.utils.endpoint_decorators import require_post_data, require_registration, track_activity
+from decider_api.views.vote_views import VOTE_ENTITIES
+from decider_app.models import CommentLike, Vote
+from decider_app.views.utils.response_builder import build_error_response, build_response
+from decider_app.views.utils.response_codes import CODE_CREATED, CODE_INVALID_DATA, CODE_SERVER_ERROR, \
+    CODE_UNKNOWN_ENTITY, CODE_UNKNOWN_QUESTION, CODE_UNKNOWN_POLL_ITEM, CODE_UNKNOWN_POLL, CODE_ALREADY_VOTED, \
+    CODE_INVALID_ENTITY, I_CODE_UNKNOWN_QUESTION, I_CODE_UNKNOWN_ENTITY, I_CODE_NO_MATCH, I_CODE_ALREADY_VOTED
+
+BATCH_MAX_ACTIONS = 100
+
+POLL_ERRORS = {
+    I_CODE_UNKNOWN_QUESTION: (CODE_UNKNOWN_QUESTION, "Question with specified id was not found"),
+    I_CODE_UNKNOWN_ENTITY: (CODE_UNKNOWN_POLL_ITEM, "Poll item with specified id was not found"),
+    I_CODE_NO_MATCH: (CODE_UNKNOWN_POLL, "Poll with specified id was not found"),
+    I_CODE_ALREADY_VOTED: (CODE_ALREADY_VOTED, "Already voted for that poll"),
+}
+
+
+def error_result(code, msg):
+    return {"status": "error", "code": code, "msg": msg}
+
+
+def parse_action(action):
+    """
+    Returns the (kind, key) of an action, kind being the like entity or 'poll',
+    or an error result for an invalid one.
+    """
+    if not isinstance(action, dict):
+        return None, error_result(CODE_INVALID_DATA, "Invalid action")
+
+    try:
+        if action.get('type') == 'like':
+            if action.get('entity') not in VOTE_ENTITIES:
+                return None, error_result(CODE_INVALID_ENTITY, "Invalid entity")
+            return action['entity'], int(action.get('entity_id'))
+        elif action.get('type') == 'poll':
+            return 'poll', (int(action.get('question_id')), int(action.get('poll_item_id')))
+    except (ValueError, TypeError):
+        pass
+    return None, error_result(CODE_INVALID_DATA, "Invalid action")
+
+
+class BatchEndpoint(ProtectedResourceView):
+    """
+    Applies a list of like toggles and poll votes in one transaction. Actions are
+    {"type": "like", "entity": ..., "entity_id": ...} or
+    {"type": "poll", "question_id": ..., "poll_item_id": ...}; the results come
+    back in the same order, each one with its own status and code.
+    """
+
+    @track_activity
+    @require_post_data(['actions'])
+    @require_registration
+    def post(self, request, *args, **kwargs):
+        try:
+            user_id = request.resource_owner.id
+            actions = json.loads(request.POST.get('data')).get('actions')
+
+            if not isinstance(actions, list) or not actions or len(actions) > BATCH_MAX_ACTIONS:
+                return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
+                                            "Some fields are invalid", ['actions'])
+
+            parsed = []
+            seen = set()
+            for action in actions:
+                kind, key = parse_action(action)
+                if kind is not None:
+                    # one like per entity and one vote per question, a second one would act on the first
+                    target = (kind, key[0] if kind == 'poll' else key)
+                    if target in seen:
+                        kind, key = None, error_result(CODE_INVALID_DATA, "Duplicate action")
+                    seen.add(target)
+                parsed.append((kind, key))
+
+            with transaction.atomic():
+                likes = {}
+                for entity in VOTE_ENTITIES:
+                    likes[entity] = toggle_likes(entity, [key for kind, key in parsed if kind == entity], user_id)
+                votes = cast_votes(user_id, [key for kind, key in parsed if kind == 'poll'])
+
+                results = []
+                questions = set()
+                comments = set()
+                events = []
+                for kind, key in parsed:
+                    if kind is None:
+                        results.append(key)
+                    elif kind == 'poll':
+                        results.append(self.poll_result(user_id, key, votes[key[0]], questions, events))
+                    else:
+                        results.append(self.like_result(user_id, kind, key, likes[kind].get(key),
+                                                        questions, comments, events))
+
+                refresh_feed_counters(list(questions), poll_items=bool(votes))
+
+            for q_id in questions:
+                cache_helper.invalidate_question(q_id)
+                cache_helper.invalidate_viewer(user_id, q_id)
+            for q_id in comments:
+                cache_helper.invalidate_comments(q_id)
+            for event in events:
+                events_helper.publish(*event)
+
+            return build_response(httplib.CREATED, CODE_CREATED, "Batch applied", results)
+        except Exception as e:
+            logger.exception(e)
+            return build_error_response(httplib.INTERNAL_SERVER_ERROR,
+                                        CODE_SERVER_ERROR, "Failed to apply batch")
+
+    @staticmethod
+    def like_result(user_id, entity, entity_id, res, questions, comments, events):
+        if res is None:
+            return error_result(CODE_UNKNOWN_ENTITY, "Unknown entity")
+
+        like_id, likes_count, q_id = res
+        if entity == 'question':
+            questions.add(q_id)
+            events.append((q_id, 'likes', {'question_id': q_id, 'likes_count': likes_count}))
+        else:
+            if like_id:
+                # the like row is written in SQL, notify the comment author the way CommentLike.save() does
+                post_save.send(sender=CommentLike, created=True,
+                               instance=CommentLike(id=like_id, user_id=user_id, comment_id=entity_id))
+            comments.add(q_id)
+            events.append((q_id, 'comment_likes', {'comment_id': entity_id, 'likes_count': likes_count}))
+
+        return {"status": "ok", "code": CODE_CREATED,
+                "data": {'voted': like_id is not None, 'entity_id': entity_id, 'likes_count': likes_count}}
+
+    @staticmethod
+    def poll_result(user_id, key, res, questions, events):
+        q_id, pi_id = key
+        res_code, vote_id, poll_id, votes_count = res
+        if res_code in POLL_ERRORS:
+            if res_code == I_CODE_NO_MATCH:
+                logger.warning("Poll item " + str(pi_id) + " did not match question " + str(q_id))
+            return error_result(*POLL_ERRORS[res_code])
+
+        post_save.send(sender=Vote, created=True,
+                       instance=Vote(id=vote_id, user_id=user_id, poll_id=poll_id, poll_item_id=pi_id))
+        questions.add(q_id)
+        events.append((q_id, 'poll', {
+            'question_id': q_id,
+            'poll': [{'poll_item_id': pi[0], 'votes_count': pi[1]} for pi in votes_count]
+        }))
+
+        return {"status": "ok", "code": CODE_CREATED,
+                "data": [{"voted": pi[0] == pi_id, "poll_item_id": pi[0], "votes_count": pi[1]}
+                         for pi in votes_count]}
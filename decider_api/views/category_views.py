@@ -17,13 +17,13 @@ class CategoriesEndpoint(ProtectedResourceView):
         except Locale.DoesNotExist:
             locale = Locale.objects.get(name="ru_RU")
 
-        categories_row, columns = get_categories(locale.id)
+        categories_row = get_categories(locale.id)
 
         data = []
         for category in categories_row:
             data.append({
-                'id': category[columns.index('id')],
-                'name': category[columns.index('name')]
+                'id': category['id'],
+                'name': category['name']
             })
 
         extra_fields = {
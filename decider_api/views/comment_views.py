@@ -3,12 +3,16 @@ import json
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
 from oauth2_provider.views import ProtectedResourceView
-from decider_api.db.comments import get_comments
+from decider_api.db.counters import increment
+from decider_api.db.feed_entries import refresh_feed_counters
 from decider_api.log_manager import logger
+from decider_api.utils import cache_helper, events_helper
+from decider_api.utils.comment_helper import get_comments_page, get_comments_by_id, ORDERS, DEFAULT_ORDER, \
+    DEFAULT_LIMIT
+from decider_api.utils.cursor_helper import InvalidCursor
 from decider_api.utils.endpoint_decorators import require_post_data, require_params, \
     require_registration, track_activity
-from decider_api.utils.helper import get_short_user_data, check_params_types, get_short_user_row_data, \
-    str2bool
+from decider_api.utils.helper import get_short_user_data, check_params_types, str2bool
 from decider_app.models import Question, Comment
 from decider_app.views.utils.response_builder import build_error_response, build_response
 from decider_app.views.utils.response_codes import CODE_INVALID_DATA, CODE_UNKNOWN_QUESTION, CODE_CREATED, \
@@ -17,29 +21,23 @@ from decider_app.views.utils.response_codes import CODE_INVALID_DATA, CODE_UNKNO
 
 class CommentsEndpoint(ProtectedResourceView):
 
-    ALLOWED_ORDER_FIELDS = ['creation_date', '-creation_date']
-    DEFAULT_LIMIT = 30
-
     @require_params(['question_id'])
     @track_activity
     @require_registration
     def get(self, request, *args, **kwargs):
         params = {
             'question_id': request.GET.get('question_id'),
-            'limit': request.GET.get('limit') if request.GET.get('limit') else self.DEFAULT_LIMIT,
-            'offset': request.GET.get('offset')
+            'limit': request.GET.get('limit') if request.GET.get('limit') else DEFAULT_LIMIT,
+            'offset': request.GET.get('offset'),
+            'since_id': request.GET.get('since_id'),
+            'before_id': request.GET.get('before_id')
         }
 
         errors = check_params_types(params, int)
 
         order = request.GET.get('order')
-        if order and order in self.ALLOWED_ORDER_FIELDS:
-            if order.startswith('-'):
-                order = order[1:] + " desc"
-            else:
-                order += " asc"
-        else:
-            order = "creation_date desc"
+        if order not in ORDERS:
+            order = DEFAULT_ORDER
 
         if errors:
             return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
@@ -51,38 +49,23 @@ class CommentsEndpoint(ProtectedResourceView):
             return build_error_response(httplib.BAD_REQUEST, CODE_UNKNOWN_QUESTION,
                                         "Question is unknown")
 
-        comments_list, c_columns = get_comments(request.resource_owner.id, params['question_id'],
-                                                order=order,
-                                                limit=params['limit'], offset=params['offset'])
-        comments = []
-        for comment_row in comments_list:
-            is_anonymous = comment_row[c_columns.index('is_anonymous')]
-            force_deanon = True if int(comment_row[c_columns.index('author_id')]) == request.resource_owner.id else False
-            comments.append({
-                'id': comment_row[c_columns.index('id')],
-                'text': comment_row[c_columns.index('text')],
-                'creation_date': comment_row[c_columns.index('creation_date')],
-                'likes_count': comment_row[c_columns.index('likes_count')],
-                'author': get_short_user_row_data(comment_row, c_columns, 'author', is_anonymous, force_deanon),
-                'voted': True if comment_row[c_columns.index('voted')] else False,
-                'is_anonymous': is_anonymous,
-                'question_id': comment_row[c_columns.index('question_id')]
-            })
+        if params['since_id'] or params['before_id']:
+            data = get_comments_by_id(request.resource_owner.id, question.id,
+                                      since_id=params['since_id'] or None,
+                                      before_id=params['before_id'] or None,
+                                      limit=params['limit'])
+            return build_response(httplib.OK, CODE_OK, "Successfully fetched comments", data=data)
 
-        if not comments_list:
-            remaining = 0
-        else:
-            remaining = question.comments_count \
-                        - (int(params['offset']) if params.get('offset') else 0) \
-                        - (int(params['limit']) if params.get('limit') else 0)
-        data = {
-            'remaining': remaining if remaining >= 0 else 0,
-            'comments': comments
-        }
+        try:
+            data = get_comments_page(request.resource_owner.id, question.id, question.comments_count, order=order,
+                                     limit=params['limit'], offset=params['offset'],
+                                     cursor=request.GET.get('cursor'))
+        except InvalidCursor:
+            return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
+                                        "Some fields are invalid", ['cursor'])
 
         return build_response(httplib.OK, CODE_OK, "Successfully fetched comments", data=data)
 
-    @transaction.atomic
     @require_post_data(['text', 'question_id'])
     @require_registration
     def post(self, request, *args, **kwargs):
@@ -112,11 +95,24 @@ class CommentsEndpoint(ProtectedResourceView):
                 return build_error_response(httplib.BAD_REQUEST, CODE_UNKNOWN_QUESTION,
                                             "Question is unknown")
 
-            comment = Comment.objects.create(text=text, question=question,
-                                             is_anonymous=is_anonymous,
-                                             author=request.resource_owner)
-            question.comments_count += 1
-            question.save()
+            with transaction.atomic():
+                comment = Comment.objects.create(text=text, question=question,
+                                                 is_anonymous=is_anonymous,
+                                                 author=request.resource_owner)
+                comments_count = increment('question', question.id, 'comments_count')
+                refresh_feed_counters([question.id])
+
+            cache_helper.invalidate_question(question.id)
+            cache_helper.invalidate_comments(question.id)
+            events_helper.publish(question.id, 'comment', {
+                'id': comment.id,
+                'text': comment.text,
+                'creation_date': comment.creation_date,
+                'question_id': question.id,
+                'is_anonymous': comment.is_anonymous,
+                'author': get_short_user_data(comment.author, comment.is_anonymous),
+                'comments_count': comments_count
+            })
 
             try:
                 last_seen_id = int(data.get('last_seen_id'))
@@ -0,0 +1,71 @@
+import httplib
+import json
+import time
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import StreamingHttpResponse
+from oauth2_provider.views import ProtectedResourceView
+from decider_api.utils.endpoint_decorators import require_registration
+from decider_api.utils.events_helper import broker
+from decider_app.models import Question
+from decider_app.views.utils.response_builder import build_error_response, build_response
+from decider_app.views.utils.response_codes import CODE_INVALID_DATA, CODE_UNKNOWN_QUESTION, CODE_OK
+from decider_backend.settings import EVENTS_POLL_TIMEOUT, EVENTS_STREAM_TIMEOUT
+
+
+def format_sse(event):
+    return 'id: {0}\nevent: {1}\ndata: {2}\n\n'.format(event['id'], event['type'],
+                                                       json.dumps(event['data'], cls=DjangoJSONEncoder))
+
+
+def stream_events(q_id, last_event_id):
+    deadline = time.time() + EVENTS_STREAM_TIMEOUT
+    # a retry hint keeps reconnects after the stream closes quick
+    yield 'retry: 1000\n\n'
+    while time.time() < deadline:
+        events = broker.wait(q_id, last_event_id, min(EVENTS_POLL_TIMEOUT, deadline - time.time()))
+        if not events:
+            yield ': keepalive\n\n'
+            continue
+        for event in events:
+            yield format_sse(event)
+        last_event_id = events[-1]['id']
+
+
+class QuestionEventsEndpoint(ProtectedResourceView):
+    """
+    Live comment and vote updates of a question. Long-polls by default: the request
+    is held until an event newer than last_event_id is published or the poll times
+    out. Clients sending Accept: text/event-stream get server-sent events instead,
+    resumed with the Last-Event-ID header when the stream is reopened.
+    """
+
+    @require_registration
+    def get(self, request, *args, **kwargs):
+        try:
+            q_id = int(kwargs.get('question_id'))
+            last_event_id = request.GET.get('last_event_id') or request.META.get('HTTP_LAST_EVENT_ID')
+            last_event_id = int(last_event_id) if last_event_id else broker.last_event_id()
+        except (ValueError, TypeError):
+            return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
+                                        "Some fields are invalid", ['last_event_id'])
+
+        if not Question.objects.filter(id=q_id, is_active=True).exists():
+            return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_QUESTION,
+                                        "Question with specified id was not found")
+
+        # nothing below needs the database, don't keep a connection for the whole wait
+        connection.close()
+
+        if 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            response = StreamingHttpResponse(stream_events(q_id, last_event_id), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        events = broker.wait(q_id, last_event_id, EVENTS_POLL_TIMEOUT)
+        data = {
+            'events': events,
+            'last_event_id': events[-1]['id'] if events else last_event_id
+        }
+        return build_response(httplib.OK, CODE_OK, "Successfully fetched events", data=data)
@@ -1,10 +1,8 @@
 import httplib
-import os
 from django.db import transaction
 from oauth2_provider.views import ProtectedResourceView
 from decider_api.utils.endpoint_decorators import require_registration, track_activity
-from decider_api.utils.image_helper import upload_image
-from decider_app.models import Picture
+from decider_api.utils.image_helper import upload_image, create_picture
 from decider_app.views.utils.response_builder import build_error_response, build_response
 from decider_app.views.utils.response_codes import CODE_CREATED, \
     CODE_REQUIRED_PARAMS_MISSING
@@ -36,9 +34,7 @@ class ImagesEndpoint(ProtectedResourceView):
             return build_error_response(*error)
         data = result.get('data')
 
-        Picture.objects.create(url=os.path.join('media', data['image_url']),
-                               preview_url=os.path.join('media', data['preview_url']),
-                               uid=data['uid'])
+        create_picture(data)
 
         return build_response(httplib.CREATED, CODE_CREATED, "Images uploaded",
                               data={'uid': data['uid']})
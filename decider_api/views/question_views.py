@@ -6,18 +6,26 @@ import os
 from django.db import transaction
 from oauth2_provider.views import ProtectedResourceView
 import re
-from decider_api.db.comments import get_comments
+from decider_api.db.counters import add_pending
+from decider_api.db.poll import get_user_votes
 from decider_api.db.poll_items import get_poll_items
 from decider_api.db.questions import tab_switch, get_question
+from decider_api.db.vote import get_user_likes
 from decider_api.log_manager import logger
+from decider_api.utils import cache_helper
+from decider_api.utils.comment_helper import get_comments_page
+from decider_api.utils.cursor_helper import InvalidCursor
 from decider_api.utils.endpoint_decorators import require_params, require_registration, track_activity
+from decider_api.utils.feed_helper import select_renditions
+from decider_api.utils.prefetch_helper import get_feed_page_prefetched
 from decider_api.utils.helper import get_short_user_data, get_short_user_row_data, str2bool
-from decider_api.utils.image_helper import upload_image
+from decider_api.utils.image_helper import upload_images, stage_upload, create_picture
 from decider_app.models import Question, Category, Poll, PollItem, Picture
 from decider_app.views.utils.response_builder import build_response, build_error_response
 from decider_app.views.utils.response_codes import *
-from decider_backend.settings import STATIC_ROOT, MEDIA_ROOT
+from decider_backend.settings import STATIC_ROOT, MEDIA_ROOT, IMAGES_ASYNC
 from push_service.app import app
+from push_service.tasks.image_tasks import process_question_images
 
 
 class QuestionsEndpoint(ProtectedResourceView):
@@ -29,6 +37,7 @@ class QuestionsEndpoint(ProtectedResourceView):
             tab = request.GET.get('tab')
             limit = request.GET.get('limit')
             offset = request.GET.get('offset')
+            cursor = request.GET.get('cursor')
             first_question_id = request.GET.get('first_question_id')
             if first_question_id:
                 first_question_id = int(first_question_id)
@@ -37,14 +46,13 @@ class QuestionsEndpoint(ProtectedResourceView):
             errors = []
             if tab:
                 try:
-                    tab_func = tab_switch(tab.lower())
-                    if tab_func is None:
+                    if tab_switch(tab.lower()) is None:
                         return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_TAB, "Tab is unknown")
                 except TypeError:
                     logger.warning("Wrong tab format")
                     return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_TAB, "Tab is unknown")
             else:
-                tab_func = tab_switch('new')
+                tab = 'new'
 
             if categories:
                 try:
@@ -64,63 +72,44 @@ class QuestionsEndpoint(ProtectedResourceView):
                 except ValueError:
                     errors.append('offset')
 
+            # width of the image slot in css pixels, dpr its device pixel ratio
+            image_width = request.GET.get('width')
+            if image_width:
+                try:
+                    dpr = float(request.GET.get('dpr') or 1)
+                    # nan and inf parse as floats too
+                    if not 0 < dpr < float('inf'):
+                        raise ValueError
+                except ValueError:
+                    dpr = None
+                    errors.append('dpr')
+                try:
+                    image_width = int(round(int(image_width) * (dpr or 1)))
+                except (ValueError, OverflowError):
+                    errors.append('width')
+            webp = str2bool(request.GET.get('webp')) is True
+
             if errors:
                 return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
                                             "Some parameters are invalid", errors)
 
-            question_list, q_columns = tab_func(user_id=request.resource_owner.id,
-                                                limit=limit,
-                                                offset=offset,
-                                                categories=categories,
-                                                first_question_id=first_question_id)
-            questions = []
-            polls = []
-            for question_row in question_list:
-                poll_id = question_row[q_columns.index('poll_id')]
-                if poll_id:
-                    polls.append(poll_id)
-
-            poll_items_list, pi_columns = get_poll_items(request.resource_owner.id, polls)
-
-            poll_items = {}
-            for poll_item_row in poll_items_list:
-                q_id = poll_item_row[pi_columns.index('question_id')]
-                pi = {
-                    'id': poll_item_row[pi_columns.index('id')],
-                    'text': poll_item_row[pi_columns.index('text')],
-                    'image_url': poll_item_row[pi_columns.index('image_url')],
-                    'preview_url': poll_item_row[pi_columns.index('preview_url')],
-                    'votes_count': poll_item_row[pi_columns.index('votes_count')],
-                    'voted': True if poll_item_row[pi_columns.index('voted')] else False,
-                }
-
-                if not poll_items.get(q_id):
-                    poll_items[q_id] = []
-                poll_items[q_id].append(pi)
-
-            for question_row in question_list:
-                poll = poll_items.get(question_row[q_columns.index('id')])
-                if poll:
-                    poll = sorted(poll, key=lambda k: k['id'])
-
-                is_anonymous = question_row[q_columns.index('is_anonymous')]
-                force_deanon = True if tab == 'my' or int(question_row[q_columns.index('author_id')]) == request.resource_owner.id else False
-                question = {
-                    'id': question_row[q_columns.index('id')],
-                    'text': question_row[q_columns.index('text')],
-                    'creation_date': question_row[q_columns.index('creation_date')],
-                    'category_id': question_row[q_columns.index('category_id')],
-                    'likes_count': question_row[q_columns.index('likes_count')],
-                    'comments_count': question_row[q_columns.index('comments_count')],
-                    'author': get_short_user_row_data(question_row, q_columns, 'author', is_anonymous, force_deanon),
-                    'poll': poll,
-                    'is_anonymous': is_anonymous,
-                    'voted': True if question_row[q_columns.index('voted')] else False,
-                }
-
-                questions.append(question)
-
-            extra_fields = {'count': len(questions)}
+            try:
+                questions, next_cursor = get_feed_page_prefetched(request.resource_owner.id, tab.lower(),
+                                                                  limit=limit,
+                                                                  offset=offset,
+                                                                  cursor=cursor,
+                                                                  categories=categories,
+                                                                  first_question_id=first_question_id)
+            except InvalidCursor:
+                return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
+                                            "Some parameters are invalid", ['cursor'])
+
+            questions = select_renditions(questions, image_width or None, webp)
+
+            extra_fields = {
+                'count': len(questions),
+                'next_cursor': next_cursor
+            }
             return build_response(httplib.OK, CODE_OK, "Successfully fetched questions",
                                   questions, extra_fields)
 
@@ -129,7 +118,6 @@ class QuestionsEndpoint(ProtectedResourceView):
             return build_error_response(httplib.INTERNAL_SERVER_ERROR,
                                         CODE_SERVER_ERROR, "Failed to fetch questions")
 
-    @transaction.atomic
     @track_activity
     @require_params(['text', 'category_id'])
     @require_registration
@@ -173,38 +161,51 @@ class QuestionsEndpoint(ProtectedResourceView):
             except Category.DoesNotExist:
                 return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_CATEGORY, "Category is unknown")
 
-            question = Question.objects.create(text=text, category=category, is_anonymous=is_anonymous,
-                                               author=request.resource_owner)
-            question_poll = Poll.objects.create(question=question, items_count=items_count)
-
-            data_poll = []
-            for i in range(1, items_count+1):
-                poll_num = "poll_" + str(i)
-
-                text = request.POST.get(poll_num + '_text')
-                image = request.FILES.get(poll_num + '_image')
-                preview = request.FILES.get(poll_num + '_preview')
-
-                result = upload_image(image, preview, 'polls')
-                error = result.get('error')
-                if error:
-                    return build_error_response(*error, errors=[poll_num])
-                data = result.get('data')
-
-                picture = Picture.objects.create(url=os.path.join('media', data.get('image_url')),
-                                                 preview_url=os.path.join('media', data.get('preview_url')),
-                                                 uid=data.get('uid'),)
-
-                pi = PollItem.objects.create(poll=question_poll, question=question,
-                                             text=text, picture=picture)
-
-                data_poll.append({
-                    'id': pi.id,
-                    'text': pi.text,
-                    'image_url': pi.picture.url if pi.picture else None,
-                    'preview_url': pi.picture.preview_url if pi.picture else None,
-                    'votes_count': pi.votes_count
-                })
+            # images are written before the transaction opens, so it is not held over image work
+            files = [(request.FILES.get('poll_' + str(i) + '_image'), request.FILES.get('poll_' + str(i) + '_preview'))
+                     for i in range(1, items_count+1)]
+            uploads = []
+            if IMAGES_ASYNC:
+                for i, (image, preview) in enumerate(files, 1):
+                    staged = (stage_upload(image, 'polls'), stage_upload(preview, 'polls'))
+                    if None in staged:
+                        return build_error_response(httplib.INTERNAL_SERVER_ERROR, CODE_IMAGE_UPLOAD_FAILED,
+                                                    'Image upload failed', errors=["poll_" + str(i)])
+                    uploads.append(staged)
+            else:
+                for i, result in enumerate(upload_images(files, 'polls', renditions=True), 1):
+                    error = result.get('error')
+                    if error:
+                        return build_error_response(*error, errors=["poll_" + str(i)])
+                    uploads.append(result.get('data'))
+
+            with transaction.atomic():
+                question = Question.objects.create(text=text, category=category, is_anonymous=is_anonymous,
+                                                   author=request.resource_owner,
+                                                   is_active=not IMAGES_ASYNC,
+                                                   status='processing' if IMAGES_ASYNC else 'ready')
+                question_poll = Poll.objects.create(question=question, items_count=items_count)
+
+                data_poll = []
+                for i in range(1, items_count+1):
+                    poll_num = "poll_" + str(i)
+
+                    text = request.POST.get(poll_num + '_text')
+
+                    picture = None
+                    if not IMAGES_ASYNC:
+                        picture = create_picture(uploads[i-1])
+
+                    pi = PollItem.objects.create(poll=question_poll, question=question,
+                                                 text=text, picture=picture)
+
+                    data_poll.append({
+                        'id': pi.id,
+                        'text': pi.text,
+                        'image_url': pi.picture.url if pi.picture else None,
+                        'preview_url': pi.picture.preview_url if pi.picture else None,
+                        'votes_count': pi.votes_count
+                    })
 
             data = {
                 "id": question.id,
@@ -214,9 +215,18 @@ class QuestionsEndpoint(ProtectedResourceView):
                 "author": get_short_user_data(request.resource_owner, force_deanon=True),
                 "poll": data_poll,
                 "is_anonymous": question.is_anonymous,
-                "likes_count": question.likes_count
+                "likes_count": question.likes_count,
+                "status": question.status
             }
-            create_share_image.delay(question_id=question.id)
+
+            # dispatched once the rows are committed, the worker would not see them otherwise
+            if IMAGES_ASYNC:
+                items = [(pi['id'], image_path, preview_path)
+                         for pi, (image_path, preview_path) in zip(data_poll, uploads)]
+                process_question_images.delay(question.id, items)
+            else:
+                create_share_image.delay(question_id=question.id)
+                cache_helper.invalidate_feed()
 
             return build_response(httplib.CREATED, CODE_CREATED, "Question added", data)
         except Exception as e:
@@ -238,60 +248,55 @@ class QuestionDetailsEndpoint(ProtectedResourceView):
                 return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_DATA,
                                             "Some fields are invalid", ["question_id"])
 
-            question_row, q_columns = get_question(request.resource_owner.id, q_id)
+            question_row = get_question(q_id)
             if question_row is None:
                 return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_QUESTION,
                                             "Question with specified id was not found")
+            add_pending('question', [question_row], ['likes_count', 'comments_count'])
 
-            is_anonymous = question_row[q_columns.index('is_anonymous')]
-            force_deanon = True if int(question_row[q_columns.index('author_id')]) == request.resource_owner.id else False
+            is_anonymous = question_row['is_anonymous']
+            force_deanon = True if int(question_row['author_id']) == request.resource_owner.id else False
             question = {
-                'id': question_row[q_columns.index('id')],
-                'text': question_row[q_columns.index('text')],
-                'creation_date': question_row[q_columns.index('creation_date')],
-                'category_id': question_row[q_columns.index('category_id')],
-                'author': get_short_user_row_data(question_row, q_columns, 'author', is_anonymous, force_deanon),
-                'likes_count': question_row[q_columns.index('likes_count')],
+                'id': question_row['id'],
+                'text': question_row['text'],
+                'creation_date': question_row['creation_date'],
+                'category_id': question_row['category_id'],
+                'author': get_short_user_row_data(question_row, 'author', is_anonymous, force_deanon),
+                'likes_count': question_row['likes_count'],
                 'is_anonymous': is_anonymous,
-                'voted': True if question_row[q_columns.index('voted')] else False,
-                'is_active': True if str2bool(question_row[q_columns.index('is_active')]) else False
+                'voted': q_id in get_user_likes('question', [q_id], request.resource_owner.id),
+                'is_active': True if str2bool(question_row['is_active']) else False,
+                'status': question_row['status']
             }
 
-            poll_id = question_row[q_columns.index('poll_id')]
+            poll_id = question_row['poll_id']
             if poll_id:
                 question['poll'] = []
-                poll_items_list, pi_columns = get_poll_items(request.resource_owner.id, [poll_id])
+                poll_items_list = add_pending('poll_item', get_poll_items([poll_id]), ['votes_count'])
+                poll_item_id = get_user_votes(request.resource_owner.id, [poll_id]).get(poll_id)
                 for poll_item_row in poll_items_list:
                     question['poll'].append({
-                        'id': poll_item_row[pi_columns.index('id')],
-                        'text': poll_item_row[pi_columns.index('text')],
-                        'image_url': poll_item_row[pi_columns.index('image_url')],
-                        'preview_url': poll_item_row[pi_columns.index('preview_url')],
-                        'votes_count': poll_item_row[pi_columns.index('votes_count')],
-                        'voted': True if poll_item_row[pi_columns.index('voted')] else False
+                        'id': poll_item_row['id'],
+                        'text': poll_item_row['text'],
+                        'image_url': poll_item_row['image_url'],
+                        'preview_url': poll_item_row['preview_url'],
+                        'votes_count': poll_item_row['votes_count'],
+                        'voted': poll_item_row['id'] == poll_item_id
                     })
                 question['poll'] = sorted(question['poll'], key=lambda k: k['id'])
             else:
                 question['poll'] = None
 
-            if question_row[q_columns.index('comments_count')] > 0:
-                comments = []
-                comments_list, c_columns = get_comments(request.resource_owner.id, question['id'])
-                for comment_row in comments_list:
-                    is_anonymous = comment_row[c_columns.index('is_anonymous')]
-                    force_deanon = True if int(comment_row[c_columns.index('author_id')]) == request.resource_owner.id else False
-                    comments.append({
-                        'id': comment_row[c_columns.index('id')],
-                        'text': comment_row[c_columns.index('text')],
-                        'creation_date': comment_row[c_columns.index('creation_date')],
-                        'likes_count': comment_row[c_columns.index('likes_count')],
-                        'author': get_short_user_row_data(question_row, q_columns, 'author', is_anonymous, force_deanon),
-                        'voted': True if comment_row[c_columns.index('voted')] else False,
-                        'is_anonymous': is_anonymous
-                    })
-                question['comments'] = comments
+            # only the first page is embedded, the rest is paged through CommentsEndpoint with the cursor
+            if question_row['comments_count'] > 0:
+                page = get_comments_page(request.resource_owner.id, q_id, question_row['comments_count'])
+                question['comments'] = page['comments']
+                question['comments_remaining'] = page['remaining']
+                question['comments_cursor'] = page['next_cursor']
             else:
                 question['comments'] = None
+                question['comments_remaining'] = 0
+                question['comments_cursor'] = None
 
             return build_response(httplib.OK, CODE_OK, "Successfully fetched question", data=question)
 
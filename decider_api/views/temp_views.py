@@ -4,7 +4,7 @@ from django.db import transaction
 from django.db.models.loading import get_model
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from decider_api.utils import gcm_helper
+from decider_api.utils import gcm_helper, cache_helper
 from decider_api.utils.endpoint_decorators import require_params
 from decider_api.utils.helper import str2bool
 from decider_app.models import *
@@ -187,3 +187,7 @@ def send_periodic(request):
     many_votes_notification.apply_async((question.author_id, q_id, count),)
     many_comments_notification.apply_async((question.author_id, q_id, count),)
     return build_response(httplib.OK, CODE_OK, "Sent")
+
+
+def feed_stats(request):
+    return build_response(httplib.OK, CODE_OK, "Feed prefetch stats", cache_helper.get_prefetch_stats())
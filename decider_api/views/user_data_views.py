@@ -1,14 +1,15 @@
 import httplib
-import os
 import dateutil.parser
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.loading import get_model
 from oauth2_provider.views import ProtectedResourceView
+from decider_api.db.feed_entries import refresh_feed_entries
 from decider_api.log_manager import logger
+from decider_api.utils import cache_helper
 from decider_api.utils.endpoint_decorators import track_activity
 from decider_api.utils.helper import get_user_data, str2bool
-from decider_api.utils.image_helper import upload_image
-from decider_app.models import User, Picture
+from decider_api.utils.image_helper import upload_image, create_picture
+from decider_app.models import User, Question
 from decider_app.views.utils.response_builder import build_error_response, build_response
 from decider_app.views.utils.response_codes import CODE_UNKNOWN_USER, CODE_INVALID_DATA, CODE_OK, \
     CODE_CREATED, CODE_SERVER_ERROR, CODE_USERNAME_TAKEN, CODE_REGISTRATION_UNFINISHED, CODE_INSUFFICIENT_CREDENTIALS
@@ -101,14 +102,15 @@ class UserDataEndpoint(ProtectedResourceView):
 
             data = result.get('data')
 
-            picture = Picture.objects.create(url=os.path.join('media', data.get('image_url')),
-                                             uid=data.get('uid'),)
-            user.avatar = picture
+            user.avatar = create_picture(data)
 
         is_anonymous = str2bool(request.POST.get('is_anonymous'))
         if is_anonymous is not None:
             user.is_anonymous = is_anonymous
 
         user.save()
+        q_ids = list(Question.objects.filter(author=user).values_list('id', flat=True))
+        refresh_feed_entries(q_ids)
+        cache_helper.invalidate_questions(q_ids)
 
         return build_response(httplib.CREATED, CODE_CREATED, "User successfully updated", get_user_data(user, force_deanon=True))
@@ -1,8 +1,12 @@
 import httplib
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.db.models.loading import get_model
 from django.shortcuts import render
 from oauth2_provider.views import ProtectedResourceView
+from decider_api.db.counters import report_spam
+from decider_api.db.feed_entries import refresh_feed_entries
+from decider_api.utils import cache_helper
 from decider_api.utils.endpoint_decorators import track_activity, require_params
 from decider_app.models import Question, SpamReport
 from decider_app.views.utils.response_builder import build_error_response, build_response
@@ -28,8 +32,17 @@ class SpamEndpoint(ProtectedResourceView):
             return build_error_response(httplib.BAD_REQUEST, CODE_UNKNOWN_ENTITY, "Unknown entity")
 
         if created:
-            ent.spam_count += 1
-            ent.is_active = True if ent.spam_count < 5 else False
-            ent.save()
+            with transaction.atomic():
+                spam_count, is_active = report_spam(entity, ent.id)
+                # the feed entry has no spam count, it only goes with the question
+                if entity == 'question' and not is_active:
+                    refresh_feed_entries([ent.id])
+
+            if entity == 'question':
+                cache_helper.invalidate_question(ent.id)
+                if not is_active:
+                    cache_helper.invalidate_feed()
+            elif ent.question_id:
+                cache_helper.invalidate_comments(ent.question_id)
 
         return build_response(httplib.CREATED, CODE_CREATED, "Marked successfully")
@@ -1,12 +1,16 @@
 import httplib
 from django.db import transaction
+from django.db.models.signals import post_save
 from oauth2_provider.views import ProtectedResourceView
-from decider_api.db.vote import get_vote, insert_vote, delete_vote
+from decider_api.db.feed_entries import refresh_feed_counters
+from decider_api.db.vote import toggle_like
 from decider_api.log_manager import logger
+from decider_api.utils import cache_helper, events_helper
 from decider_api.utils.endpoint_decorators import require_registration, track_activity, require_params
+from decider_app.models import Comment, CommentLike
 from decider_app.views.utils.response_builder import build_error_response, build_response
 from decider_app.views.utils.response_codes import CODE_INVALID_DATA, CODE_INVALID_ENTITY, CODE_CREATED, \
-    I_CODE_ALREADY_VOTED, I_CODE_UNKNOWN_ENTITY, CODE_UNKNOWN_ENTITY
+    CODE_UNKNOWN_ENTITY
 
 
 VOTE_ENTITIES = ['question', 'comment']
@@ -14,7 +18,6 @@ VOTE_ENTITIES = ['question', 'comment']
 
 class VoteEndpoint(ProtectedResourceView):
 
-    @transaction.atomic
     @track_activity
     @require_params(['entity', 'entity_id'])
     @require_registration
@@ -27,22 +30,38 @@ class VoteEndpoint(ProtectedResourceView):
                 return build_error_response(httplib.BAD_REQUEST, CODE_INVALID_ENTITY,
                                             "Invalid entity")
 
-            res, likes = get_vote(entity, entity_id, request.resource_owner.id)
-            if res == I_CODE_UNKNOWN_ENTITY:
-                return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_ENTITY,
-                                            msg="Unknown entity")
+            with transaction.atomic():
+                res = toggle_like(entity, entity_id, request.resource_owner.id)
+                if res is None:
+                    return build_error_response(httplib.NOT_FOUND, CODE_UNKNOWN_ENTITY,
+                                                msg="Unknown entity")
 
-            already_voted = True if res == I_CODE_ALREADY_VOTED else False
+                like_id, likes_count = res
+                if like_id and entity == 'comment':
+                    # the like row is written in SQL, notify the comment author the way CommentLike.save() does
+                    post_save.send(sender=CommentLike, created=True,
+                                   instance=CommentLike(id=like_id, user_id=request.resource_owner.id,
+                                                        comment_id=int(entity_id)))
 
-            if already_voted:
-                likes = delete_vote(entity, entity_id, request.resource_owner.id)
-            else:
-                likes = insert_vote(entity, entity_id, request.resource_owner.id)
+                if entity == 'question':
+                    refresh_feed_counters([entity_id])
+                else:
+                    q_id = Comment.objects.filter(id=entity_id).values_list('question_id', flat=True).first()
+
+            if entity == 'question':
+                cache_helper.invalidate_question(int(entity_id))
+                cache_helper.invalidate_viewer(request.resource_owner.id, int(entity_id))
+                events_helper.publish(entity_id, 'likes', {'question_id': int(entity_id),
+                                                           'likes_count': likes_count})
+            elif q_id:
+                cache_helper.invalidate_comments(q_id)
+                events_helper.publish(q_id, 'comment_likes', {'comment_id': int(entity_id),
+                                                              'likes_count': likes_count})
 
             return build_response(httplib.CREATED, CODE_CREATED,
-                                  msg="Vote successful",  data={'voted': not already_voted,
+                                  msg="Vote successful",  data={'voted': like_id is not None,
                                                                 'entity_id': entity_id,
-                                                                'likes_count': likes[0]})
+                                                                'likes_count': likes_count})
 
         except Exception as e:
             logger.exception(e)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import string
+import tempfile
+import timeit
+from PIL import Image
+from django.core.management import BaseCommand
+from decider_app.management.commands.bench_image_resize import make_photo
+from decider_api.utils.image_helper import load_resized, IMAGE_SIZE
+
+
+def decoded_size(path, draft):
+    """
+    Returns the (width, height, bytes) libjpeg decodes the photo at.
+    """
+    img = Image.open(path)
+    if draft and img.format == 'JPEG':
+        resize_scale = max(float(img.size[0])/IMAGE_SIZE[0], float(img.size[1])/IMAGE_SIZE[1])
+        if resize_scale > 1:
+            img.draft(img.mode, (int(img.size[0]/resize_scale), int(img.size[1]/resize_scale)))
+    img.load()
+    return img.size[0], img.size[1], img.size[0] * img.size[1] * len(img.getbands())
+
+
+class Command(BaseCommand):
+
+    args = 'photos=... rounds=... dir=...'
+    help = 'Compares full and draft mode decoding of camera JPEGs resized to the poll image size'
+
+    def handle(self, *args, **options):
+
+        arguments = {}
+        for arg in args:
+            try:
+                key, value = string.split(arg, '=')
+            except ValueError:
+                continue
+            arguments[key] = value
+
+        rounds = int(arguments.get('rounds', 3))
+
+        corpus = arguments.get('dir')
+        tmp_dir = None
+        if corpus:
+            photos = sorted(os.path.join(corpus, name) for name in os.listdir(corpus)
+                            if name.lower().endswith(('.jpg', '.jpeg')))
+        else:
+            tmp_dir = tempfile.mkdtemp()
+            photos = [os.path.join(tmp_dir, str(i) + '.jpg') for i in range(int(arguments.get('photos', 4)))]
+            for i, path in enumerate(photos):
+                make_photo(path, i)
+
+        try:
+            print('%d photos, resized to fit %dx%d' % (len(photos), IMAGE_SIZE[0], IMAGE_SIZE[1]))
+            totals = {}
+            for name, draft in [('full decode', False), ('draft', True)]:
+                sizes = [decoded_size(path, draft) for path in photos]
+                decoded = sum(size[2] for size in sizes)
+                timings = []
+                for i in range(rounds):
+                    start = timeit.default_timer()
+                    for path in photos:
+                        load_resized(path, IMAGE_SIZE, draft=draft)
+                    timings.append((timeit.default_timer() - start) / len(photos))
+                totals[name] = (sum(timings) / rounds, decoded / len(photos))
+                print('%-12s  %7.1f ms per photo  %6.1f MB decoded per photo, first at %dx%d' % (
+                    name, totals[name][0] * 1e3, totals[name][1] / 1e6, sizes[0][0], sizes[0][1]))
+
+            print('time %.1fx less, memory %.1fx less' % (totals['full decode'][0] / totals['draft'][0],
+                                                          float(totals['full decode'][1]) / totals['draft'][1]))
+        finally:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import shutil
+import string
+import tempfile
+import timeit
+from PIL import Image, ImageFilter
+from django.core.management import BaseCommand
+from decider_api.utils.image_helper import upload_images
+from decider_app.models import StoredImage
+from decider_backend.settings import MEDIA_ROOT, IMAGE_WORKERS
+
+# a 12MP phone photo
+PHOTO_SIZE = (4000, 3000)
+
+
+def make_photo(path, seed):
+    # blurred noise compresses about as well as a real photo, flat colour would be far too cheap to decode
+    bands = [Image.effect_noise(PHOTO_SIZE, 40 + 10 * ((seed + i) % 3)) for i in range(3)]
+    photo = Image.merge('RGB', bands).filter(ImageFilter.GaussianBlur(2))
+    photo.save(path, 'JPEG', quality=90)
+
+
+class Command(BaseCommand):
+
+    args = 'items=... rounds=... dir=...'
+    help = 'Compares sequential and concurrent resizing of the images of a question over 12MP photos'
+
+    def handle(self, *args, **options):
+
+        arguments = {}
+        for arg in args:
+            try:
+                key, value = string.split(arg, '=')
+            except ValueError:
+                continue
+            arguments[key] = value
+
+        items = int(arguments.get('items', 2))
+        rounds = int(arguments.get('rounds', 5))
+
+        corpus = arguments.get('dir')
+        tmp_dir = None
+        if corpus:
+            photos = sorted(os.path.join(corpus, name) for name in os.listdir(corpus)
+                            if name.lower().endswith(('.jpg', '.jpeg')))
+        else:
+            tmp_dir = tempfile.mkdtemp()
+            photos = [os.path.join(tmp_dir, str(i) + '.jpg') for i in range(2 * items)]
+            for i, path in enumerate(photos):
+                make_photo(path, i)
+
+        # an image and a preview per poll item, as the question form sends them
+        files = [(photos[(2 * i) % len(photos)], photos[(2 * i + 1) % len(photos)]) for i in range(items)]
+
+        try:
+            # the threads only overlap on separate cores, the speedup is bounded by the cpu count too
+            print('%d poll items, %d files, %d workers, %d cpus' % (items, 2 * items, IMAGE_WORKERS,
+                                                                    multiprocessing.cpu_count()))
+            timings = {}
+            for name, concurrent in [('sequential', False), ('concurrent', True)]:
+                # the first round warms up the pool and the page cache
+                upload_images(files, 'bench', concurrent=concurrent, dedup=False)
+                timings[name] = []
+                for i in range(rounds):
+                    start = timeit.default_timer()
+                    results = upload_images(files, 'bench', concurrent=concurrent, dedup=False)
+                    timings[name].append(timeit.default_timer() - start)
+                    if any(result.get('error') for result in results):
+                        raise Exception('resize failed')
+                timings[name].sort()
+                print('%-10s  mean %7.1f ms  p50 %7.1f ms  max %7.1f ms' % (
+                    name, sum(timings[name]) / rounds * 1e3,
+                    timings[name][rounds // 2] * 1e3, timings[name][-1] * 1e3))
+
+            print('speedup %.2fx' % (sum(timings['sequential']) / sum(timings['concurrent'])))
+        finally:
+            StoredImage.objects.filter(url__startswith=os.path.join('images', 'bench', '')).delete()
+            shutil.rmtree(os.path.join(MEDIA_ROOT, 'images', 'bench'), ignore_errors=True)
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,132 @@
+import string
+import timeit
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from decider_api.db.counters import increment
+from decider_api.db.vote import toggle_like
+from decider_app.models import User, Category, Question, Comment, CommentLike, get_random_uid
+from decider_app.views.utils.response_codes import I_CODE_ALREADY_VOTED, I_CODE_UNKNOWN_ENTITY, \
+    I_CODE_VOTE_OK
+
+# the like path toggle_like replaced, kept to compare against
+
+GET_QUERY = """ SELECT d_{0}.id as {0}_id, d_{0}_likes.id as like_id
+                FROM d_{0}
+                  LEFT JOIN d_{0}_likes
+                    ON d_{0}.id = d_{0}_likes.{0}_id AND d_{0}_likes.user_id = {1}
+                WHERE d_{0}.id = {2};"""
+
+INSERT_QUESTION_QUERY = """INSERT INTO d_question_likes (user_id, question_id)
+                           VALUES ({0}, {1})"""
+
+DELETE_QUERY = """DELETE FROM d_{0}_likes
+                  WHERE user_id={1} AND {0}_id={2}"""
+
+LIKES_QUERY = """SELECT likes_count
+                 FROM d_{0}
+                 WHERE id = {1}"""
+
+
+def get_vote(entity, entity_id, user_id):
+    cursor = connection.cursor()
+
+    cursor.execute(GET_QUERY.format(entity, user_id, entity_id))
+    res = cursor.fetchone()
+
+    if res is None:
+        cursor.close()
+        return I_CODE_UNKNOWN_ENTITY, None
+    elif res[1] is not None:
+        cursor.execute(LIKES_QUERY.format(entity, entity_id))
+        res = cursor.fetchone()
+        return I_CODE_ALREADY_VOTED, res
+    else:
+        cursor.close()
+        return I_CODE_VOTE_OK, None
+
+
+def insert_vote(entity, entity_id, user_id):
+    cursor = connection.cursor()
+
+    if entity == 'question':
+        cursor.execute(INSERT_QUESTION_QUERY.format(user_id, entity_id))
+    else:
+        CommentLike.objects.create(user_id=user_id, comment_id=entity_id)
+    cursor.close()
+
+    return increment(entity, entity_id, 'likes_count', 1),
+
+
+def delete_vote(entity, entity_id, user_id):
+    cursor = connection.cursor()
+
+    cursor.execute(DELETE_QUERY.format(entity, user_id, entity_id))
+    cursor.close()
+
+    return increment(entity, entity_id, 'likes_count', -1),
+
+
+def select_then_write(entity, entity_id, user_id):
+    res, likes = get_vote(entity, entity_id, user_id)
+    if res == I_CODE_ALREADY_VOTED:
+        return delete_vote(entity, entity_id, user_id)
+    return insert_vote(entity, entity_id, user_id)
+
+
+class Command(BaseCommand):
+
+    args = 'toggles=...'
+    help = 'Compares the latency of the select-then-write like path with the single statement toggle'
+
+    def handle(self, *args, **options):
+
+        arguments = {}
+        for arg in args:
+            try:
+                key, value = string.split(arg, '=')
+            except ValueError:
+                continue
+            arguments[key] = int(value)
+
+        toggles = arguments.get('toggles', 1000)
+
+        user = User.objects.create(uid=get_random_uid(), email=get_random_uid() + '@example.com',
+                                   username='likes_' + get_random_uid()[:8])
+        category = Category.objects.create(name='likes')
+        question = Question.objects.create(text='likes', author=user, category=category)
+        comment = Comment.objects.create(text='likes', author=user, question=question)
+
+        # the select-then-write path creates comment likes through the ORM, keep notifications out of it
+        post_save.disconnect(CommentLike.comment_like_handler, sender=CommentLike)
+        try:
+            for entity, entity_id in [('question', question.id), ('comment', comment.id)]:
+                for name, toggle in [('select then write', select_then_write), ('single statement', toggle_like)]:
+                    self.bench(name, entity, entity_id, user.id, toggle, toggles)
+        finally:
+            post_save.connect(CommentLike.comment_like_handler, sender=CommentLike)
+            # the question and the comment go with their author
+            user.delete()
+            category.delete()
+
+    def bench(self, name, entity, entity_id, user_id, toggle, toggles):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                toggle(entity, entity_id, user_id)
+        # savepoints of the retry are not round trips the path needs
+        statements = [q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+
+        timings = []
+        for i in range(toggles):
+            start = timeit.default_timer()
+            with transaction.atomic():
+                toggle(entity, entity_id, user_id)
+            timings.append(timeit.default_timer() - start)
+
+        timings.sort()
+        print('%-8s %-18s %2d statements  mean %7.1f us  p50 %7.1f us  p95 %7.1f us' % (
+            entity, name, len(statements),
+            sum(timings) / len(timings) * 1e6,
+            timings[len(timings) // 2] * 1e6,
+            timings[int(len(timings) * 0.95)] * 1e6))
@@ -0,0 +1,63 @@
+import string
+import timeit
+from django.core.management import BaseCommand
+from decider_api.db.rows import fetch_dicts
+
+COLUMNS = ['id', 'text', 'creation_date', 'is_active', 'category_id', 'poll_id', 'author_id',
+           'likes_count', 'comments_count', 'is_anonymous', 'author_first_name', 'author_last_name',
+           'author_middle_name', 'author_username', 'author_uid', 'author_image_url',
+           'author_anonymous', 'popularity']
+
+FIELDS = ['id', 'text', 'creation_date', 'category_id', 'likes_count', 'comments_count',
+          'is_anonymous', 'author_id', 'author_anonymous', 'poll_id', 'author_uid', 'author_username',
+          'author_first_name', 'author_last_name', 'author_middle_name', 'author_image_url']
+
+
+class FakeCursor(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = [(name, None, None, None, None, None, None) for name in COLUMNS]
+
+    def fetchall(self):
+        return self.rows
+
+
+def by_index(cursor):
+    rows = cursor.fetchall()
+    columns = [i[0] for i in cursor.description]
+    return [[row[columns.index(field)] for field in FIELDS] for row in rows]
+
+
+def by_mapping(cursor):
+    return [[row[field] for field in FIELDS] for row in fetch_dicts(cursor)]
+
+
+class Command(BaseCommand):
+
+    args = 'rows=... repeat=...'
+    help = 'Compares per-field columns.index() lookups with decider_api.db.rows on a feed-sized page'
+
+    def handle(self, *args, **options):
+
+        arguments = {}
+        for arg in args:
+            try:
+                key, value = string.split(arg, '=')
+            except ValueError:
+                continue
+            arguments[key] = int(value)
+
+        rows_count = arguments.get('rows', 100)
+        repeat = arguments.get('repeat', 1000)
+
+        rows = [tuple(i * len(COLUMNS) + j for j in range(len(COLUMNS))) for i in range(rows_count)]
+        cursor = FakeCursor(rows)
+        assert by_index(cursor) == by_mapping(cursor)
+
+        index_time = min(timeit.repeat(lambda: by_index(cursor), number=repeat, repeat=3))
+        mapping_time = min(timeit.repeat(lambda: by_mapping(cursor), number=repeat, repeat=3))
+
+        print('%d rows x %d pages' % (rows_count, repeat))
+        print('columns.index: %.1f us/page' % (index_time / repeat * 1e6))
+        print('row mapping:   %.1f us/page' % (mapping_time / repeat * 1e6))
+        print('speedup:       %.2fx' % (index_time / mapping_time))
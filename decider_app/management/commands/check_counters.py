@@ -0,0 +1,104 @@
+import string
+import threading
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from decider_api.db.counters import increment, increment_votes, report_spam, fold_deltas
+from decider_app.models import User, Category, Question, Poll, PollItem, Comment, get_random_uid
+
+RMW_SELECT_QUERY = "SELECT spam_count FROM d_question WHERE id = %s"
+RMW_UPDATE_QUERY = "UPDATE d_question SET spam_count = %s WHERE id = %s"
+
+
+def counter_writer(question, comment, poll_item, increments):
+    try:
+        for i in range(increments):
+            with transaction.atomic():
+                increment('question', question.id, 'comments_count')
+                increment('comment', comment.id, 'likes_count')
+                increment_votes(poll_item.id)
+                report_spam('comment', comment.id)
+    finally:
+        connection.close()
+
+
+def read_modify_write_writer(question, increments):
+    try:
+        cursor = connection.cursor()
+        for i in range(increments):
+            with transaction.atomic():
+                cursor.execute(RMW_SELECT_QUERY, [question.id])
+                spam_count = cursor.fetchone()[0]
+                cursor.execute(RMW_UPDATE_QUERY, [spam_count + 1, question.id])
+        cursor.close()
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+
+    args = 'threads=... increments=...'
+    help = 'Fires parallel writers at the counters of a scratch question and checks the totals'
+
+    def handle(self, *args, **options):
+
+        arguments = {}
+        for arg in args:
+            try:
+                key, value = string.split(arg, '=')
+            except ValueError:
+                continue
+            arguments[key] = int(value)
+
+        threads_count = arguments.get('threads', 8)
+        increments = arguments.get('increments', 200)
+        expected = threads_count * increments
+
+        user = User.objects.create(uid=get_random_uid(), email=get_random_uid() + '@example.com',
+                                   username='counters_' + get_random_uid()[:8])
+        category = Category.objects.create(name='counters')
+        question = Question.objects.create(text='counters', author=user, category=category)
+        poll = Poll.objects.create(question=question, items_count=1)
+        poll_item = PollItem.objects.create(poll=poll, question=question, text='counters')
+        comment = Comment.objects.create(text='counters', author=user, question=question)
+
+        try:
+            self.run_writers(counter_writer, (question, comment, poll_item, increments), threads_count)
+            self.run_writers(read_modify_write_writer, (question, increments), threads_count)
+
+            # in the buffered mode the totals only show up once the deltas are folded
+            while fold_deltas(expected):
+                pass
+
+            question = Question.objects.get(id=question.id)
+            comment = Comment.objects.get(id=comment.id)
+            poll_item = PollItem.objects.get(id=poll_item.id)
+
+            totals = [
+                ('question comments_count', question.comments_count, expected),
+                ('question popularity', question.popularity, 2 * expected),
+                ('comment likes_count', comment.likes_count, expected),
+                ('comment spam_count', comment.spam_count, expected),
+                ('poll item votes_count', poll_item.votes_count, expected),
+            ]
+
+            failed = []
+            for name, value, wanted in totals:
+                print('%-26s %8d / %d' % (name, value, wanted))
+                if value != wanted:
+                    failed.append(name)
+
+            print('read-modify-write lost %d of %d increments' % (expected - question.spam_count, expected))
+
+            if failed:
+                raise CommandError('counters lost increments: ' + ', '.join(failed))
+        finally:
+            # the question, its poll and the comment go with their author
+            user.delete()
+            category.delete()
+
+    def run_writers(self, target, args, threads_count):
+        threads = [threading.Thread(target=target, args=args) for i in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
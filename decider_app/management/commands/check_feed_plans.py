@@ -0,0 +1,108 @@
+import string
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from decider_api.db.feed_entries import refresh_feed_entries
+from decider_api.db.questions import tab_switch, get_next_cursor
+from decider_app.models import User, Category, Question, get_random_uid
+
+SEED_QUESTIONS_QUERY = """INSERT INTO d_question (text, is_closed, is_anonymous, creation_date, author_id, category_id,
+                                                  comments_count, likes_count, is_active, spam_count, popularity)
+                          SELECT 'question ' || i, FALSE, FALSE, now() - i * interval '1 minute',
+                                 (%s)[1 + i %% %s], (%s)[1 + i %% %s],
+                                 i %% 50, i %% 70, i %% 100 <> 0, 0, i %% 50 + i %% 70
+                          FROM generate_series(1, %s) AS i"""
+
+SEED_POLLS_QUERY = """INSERT INTO d_poll (question_id, items_count)
+                      SELECT id, 2 FROM d_question WHERE text LIKE 'question %%'"""
+
+SEED_HOT_SCORES_QUERY = """INSERT INTO d_question_hot_score (question_id, score, date_updated)
+                           SELECT id, random() * 100, now()
+                           FROM d_question
+                           WHERE text LIKE 'question %%' AND is_active = TRUE
+                             AND creation_date > now() - interval '14 days'"""
+
+TABLES = ['d_user', 'd_category', 'd_question', 'd_poll', 'd_question_hot_score', 'd_feed_entry']
+
+SCANNED_TABLES = ['d_question', 'd_feed_entry']
+
+TABS = ['new', 'popular', 'hot', 'my']
+PAGE_SIZE = 30
+
+
+class Command(BaseCommand):
+
+    args = 'questions=...'
+    help = 'Seeds a synthetic feed in a rolled back transaction and checks the feed query plans with EXPLAIN'
+
+    def handle(self, *args, **options):
+
+        arguments = {}
+        for arg in args:
+            try:
+                key, value = string.split(arg, '=')
+            except ValueError:
+                continue
+            arguments[key] = int(value)
+
+        failed = []
+        with transaction.atomic():
+            users, categories = self.seed(arguments.get('questions', 200000))
+
+            for tab in TABS:
+                for filters in [[], categories[:1]]:
+                    first_page = self.check(tab, users[0], filters, None, failed)
+                    cursor = get_next_cursor(tab, first_page, PAGE_SIZE)
+                    if cursor:
+                        self.check(tab, users[0], filters, cursor, failed)
+
+            transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError('%d plans fall back to a seq scan or sort: %s' % (len(failed), ', '.join(failed)))
+        print('all feed plans use indexes')
+
+    def seed(self, questions_count):
+        User.objects.bulk_create([User(uid=get_random_uid(), email=get_random_uid() + '@example.com',
+                                       username='plan_' + str(i)) for i in range(200)])
+        Category.objects.bulk_create([Category(name='plan_' + str(i)) for i in range(20)])
+        users = list(User.objects.filter(username__startswith='plan_').values_list('id', flat=True))
+        categories = list(Category.objects.filter(name__startswith='plan_').values_list('id', flat=True))
+
+        cursor = connection.cursor()
+        cursor.execute(SEED_QUESTIONS_QUERY, [users, len(users), categories, len(categories), questions_count])
+        cursor.execute(SEED_POLLS_QUERY)
+        cursor.execute(SEED_HOT_SCORES_QUERY)
+
+        q_ids = list(Question.objects.filter(text__startswith='question ').values_list('id', flat=True))
+        for i in range(0, len(q_ids), 5000):
+            refresh_feed_entries(q_ids[i:i + 5000])
+
+        for table in TABLES:
+            cursor.execute('ANALYZE ' + table)
+        cursor.close()
+
+        return users, categories
+
+    def check(self, tab, user_id, categories, cursor, failed):
+        with CaptureQueriesContext(connection) as queries:
+            questions = tab_switch(tab)(user_id=user_id, limit=PAGE_SIZE, categories=categories,
+                                        cursor=cursor, with_poll_items=True)
+
+        name = '%s%s%s' % (tab, ' +category' if categories else '', ' +cursor' if cursor else '')
+        plan = self.explain(queries.captured_queries[-1]['sql'])
+        seq_scan = any('Seq Scan on %s ' % table in plan for table in SCANNED_TABLES)
+        if seq_scan or ' Sort ' in plan or plan.startswith('Sort '):
+            failed.append(name)
+            print('FAIL ' + name + '\n' + plan)
+        else:
+            print('ok   ' + name)
+
+        return questions
+
+    def explain(self, query):
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN ' + query)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.close()
+        return plan
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0021_auto_20150727_1058'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='popularity',
+            field=models.IntegerField(default=0, verbose_name='\u041f\u043e\u043f\u0443\u043b\u044f\u0440\u043d\u043e\u0441\u0442\u044c'),
+        ),
+        migrations.RunSQL(
+            """UPDATE d_question
+               SET popularity = d_question.likes_count + d_question.comments_count
+                                + COALESCE((SELECT sum(d_poll_item.votes_count)
+                                            FROM d_poll_item
+                                            WHERE d_poll_item.question_id = d_question.id), 0)""",
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterIndexTogether(
+            name='question',
+            index_together=set([('is_active', 'popularity', 'id')]),
+        ),
+    ]
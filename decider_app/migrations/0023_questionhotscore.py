@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0022_question_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionHotScore',
+            fields=[
+                ('question', models.OneToOneField(primary_key=True, serialize=False, to='decider_app.Question')),
+                ('score', models.FloatField(default=0, verbose_name='\u0420\u0435\u0439\u0442\u0438\u043d\u0433')),
+                ('date_updated', models.DateTimeField(default=django.utils.timezone.now, verbose_name='\u0414\u0430\u0442\u0430 \u043f\u0435\u0440\u0435\u0441\u0447\u0451\u0442\u0430')),
+            ],
+            options={
+                'db_table': 'd_question_hot_score',
+                'verbose_name': '\u0420\u0435\u0439\u0442\u0438\u043d\u0433 \u0432\u043e\u043f\u0440\u043e\u0441\u0430',
+                'verbose_name_plural': '\u0420\u0435\u0439\u0442\u0438\u043d\u0433\u0438 \u0432\u043e\u043f\u0440\u043e\u0441\u043e\u0432',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='questionhotscore',
+            index_together=set([('score', 'question')]),
+        ),
+    ]
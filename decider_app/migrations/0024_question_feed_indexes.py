@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0023_questionhotscore'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='question',
+            index_together=set([('is_active', 'popularity', 'id'), ('is_active', 'creation_date', 'id'),
+                                ('is_active', 'category', 'creation_date', 'id'), ('author', 'creation_date', 'id')]),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0024_question_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('question', models.OneToOneField(related_name='feed_entry', primary_key=True, serialize=False, to='decider_app.Question')),
+                ('text', models.TextField(default='', verbose_name='\u0422\u0435\u043a\u0441\u0442 \u0432\u043e\u043f\u0440\u043e\u0441\u0430', blank=True)),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='\u0414\u0430\u0442\u0430 \u0441\u043e\u0437\u0434\u0430\u043d\u0438\u044f')),
+                ('is_anonymous', models.BooleanField(default=False, verbose_name='\u0410\u043d\u043e\u043d\u0438\u043c\u0435\u043d?')),
+                ('author_first_name', models.CharField(default='', max_length=50, blank=True)),
+                ('author_last_name', models.CharField(default='', max_length=50, blank=True)),
+                ('author_middle_name', models.CharField(default='', max_length=50, blank=True)),
+                ('author_username', models.CharField(default='', max_length=50, blank=True)),
+                ('author_uid', models.CharField(default='', max_length=50, blank=True)),
+                ('author_image_url', models.CharField(max_length=255, null=True, blank=True)),
+                ('author_anonymous', models.BooleanField(default=False)),
+                ('poll_id', models.IntegerField(null=True, blank=True)),
+                ('poll_items', models.TextField(null=True, verbose_name='\u0412\u0430\u0440\u0438\u0430\u043d\u0442\u044b \u0433\u043e\u043b\u043e\u0441\u043e\u0432\u0430\u043b\u043a\u0438', blank=True)),
+                ('likes_count', models.IntegerField(default=0, verbose_name='\u041a\u043e\u043b\u0438\u0447\u0435\u0441\u0442\u0432\u043e \u043b\u0430\u0439\u043a\u043e\u0432')),
+                ('comments_count', models.IntegerField(default=0, verbose_name='\u041a\u043e\u043b\u0438\u0447\u0435\u0441\u0442\u0432\u043e \u043a\u043e\u043c\u043c\u0435\u043d\u0442\u043e\u0432')),
+                ('popularity', models.IntegerField(default=0, verbose_name='\u041f\u043e\u043f\u0443\u043b\u044f\u0440\u043d\u043e\u0441\u0442\u044c')),
+                ('author', models.ForeignKey(to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.SET_NULL, blank=True, to='decider_app.Category', null=True)),
+            ],
+            options={
+                'db_table': 'd_feed_entry',
+                'verbose_name': '\u0417\u0430\u043f\u0438\u0441\u044c \u043b\u0435\u043d\u0442\u044b',
+                'verbose_name_plural': '\u0417\u0430\u043f\u0438\u0441\u0438 \u043b\u0435\u043d\u0442\u044b',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='feedentry',
+            index_together=set([('creation_date', 'question'), ('popularity', 'question'), ('category', 'creation_date', 'question')]),
+        ),
+        migrations.RunSQL(
+            """INSERT INTO d_feed_entry (question_id, text, creation_date, category_id, is_anonymous, author_id,
+                                         author_first_name, author_last_name, author_middle_name, author_username,
+                                         author_uid, author_image_url, author_anonymous, poll_id,
+                                         likes_count, comments_count, popularity, poll_items)
+               SELECT d_question.id, d_question.text, d_question.creation_date, d_question.category_id,
+                      d_question.is_anonymous, d_question.author_id, d_user.first_name, d_user.last_name,
+                      d_user.middle_name, d_user.username, d_user.uid, d_picture.url, d_user.is_anonymous,
+                      d_poll.id, d_question.likes_count, d_question.comments_count, d_question.popularity,
+                      (SELECT json_agg(json_build_object('id', d_poll_item.id,
+                                                         'text', d_poll_item.text,
+                                                         'image_url', item_picture.url,
+                                                         'preview_url', item_picture.preview_url,
+                                                         'votes_count', d_poll_item.votes_count)
+                                       ORDER BY d_poll_item.id)
+                       FROM d_poll_item
+                         LEFT JOIN d_picture item_picture ON d_poll_item.picture_id = item_picture.id
+                       WHERE d_poll_item.poll_id = d_poll.id)::text
+               FROM d_question
+                  LEFT JOIN d_user ON d_question.author_id = d_user.id
+                  LEFT JOIN d_picture ON d_picture.id = d_user.avatar_id
+                  LEFT JOIN d_poll ON d_question.id = d_poll.question_id
+               WHERE d_question.is_active = TRUE""",
+            migrations.RunSQL.noop
+        ),
+    ]
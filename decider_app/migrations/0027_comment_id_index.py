@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0026_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='comment',
+            index_together=set([('question', 'is_active', 'creation_date', 'id'), ('question', 'is_active', 'id')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0027_comment_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterDelta',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('entity', models.CharField(max_length=20)),
+                ('entity_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=30)),
+                ('delta', models.IntegerField(default=0)),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='\u0414\u0430\u0442\u0430 \u0441\u043e\u0437\u0434\u0430\u043d\u0438\u044f')),
+            ],
+            options={
+                'db_table': 'd_counter_delta',
+                'verbose_name': '\u0418\u0437\u043c\u0435\u043d\u0435\u043d\u0438\u0435 \u0441\u0447\u0451\u0442\u0447\u0438\u043a\u0430',
+                'verbose_name_plural': '\u0418\u0437\u043c\u0435\u043d\u0435\u043d\u0438\u044f \u0441\u0447\u0451\u0442\u0447\u0438\u043a\u043e\u0432',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='counterdelta',
+            index_together=set([('entity', 'entity_id', 'field')]),
+        ),
+    ]
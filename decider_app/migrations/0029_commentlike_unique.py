@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0028_counterdelta'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """DELETE FROM d_comment_likes
+               WHERE id NOT IN (SELECT min(id) FROM d_comment_likes GROUP BY user_id, comment_id)""",
+            migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            """UPDATE d_comment
+               SET likes_count = (SELECT count(*) FROM d_comment_likes WHERE comment_id = d_comment.id)""",
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name='commentlike',
+            unique_together=set([('user', 'comment')]),
+        ),
+    ]
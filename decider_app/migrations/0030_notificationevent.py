@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0029_commentlike_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('kind', models.CharField(max_length=20, choices=[('comment', 'comment'), ('comment_like', 'comment_like'), ('vote', 'vote')])),
+                ('entity_id', models.PositiveIntegerField()),
+                ('actor_id', models.PositiveIntegerField()),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='\u0414\u0430\u0442\u0430 \u0441\u043e\u0437\u0434\u0430\u043d\u0438\u044f')),
+            ],
+            options={
+                'db_table': 'd_notification_event',
+                'verbose_name': '\u0421\u043e\u0431\u044b\u0442\u0438\u0435 \u0434\u043b\u044f \u0443\u0432\u0435\u0434\u043e\u043c\u043b\u0435\u043d\u0438\u044f',
+                'verbose_name_plural': '\u0421\u043e\u0431\u044b\u0442\u0438\u044f \u0434\u043b\u044f \u0443\u0432\u0435\u0434\u043e\u043c\u043b\u0435\u043d\u0438\u0439',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0030_notificationevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='status',
+            field=models.CharField(default='ready', max_length=20, choices=[('processing', 'processing'), ('ready', 'ready'), ('failed', 'failed')]),
+        ),
+    ]
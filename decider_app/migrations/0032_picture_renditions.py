@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0031_question_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='picture',
+            name='renditions',
+            field=models.TextField(null=True, verbose_name='\u0420\u0430\u0437\u043c\u0435\u0440\u044b \u043a\u0430\u0440\u0442\u0438\u043d\u043a\u0438', blank=True),
+        ),
+    ]
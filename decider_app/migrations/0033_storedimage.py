@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decider_app', '0032_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('key', models.CharField(unique=True, max_length=64)),
+                ('url', models.CharField(max_length=255)),
+                ('renditions', models.TextField(null=True, blank=True)),
+                ('refcount', models.IntegerField(default=0)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'd_stored_image',
+                'verbose_name': '\u0424\u0430\u0439\u043b \u043a\u0430\u0440\u0442\u0438\u043d\u043a\u0438',
+                'verbose_name_plural': '\u0424\u0430\u0439\u043b\u044b \u043a\u0430\u0440\u0442\u0438\u043d\u043e\u043a',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='storedimage',
+            index_together=set([('refcount', 'last_used')]),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='image',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='decider_app.StoredImage', null=True),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='preview_image',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='decider_app.StoredImage', null=True),
+        ),
+    ]
@@ -1,10 +1,9 @@
 # coding=utf-8
 import hashlib
 import uuid
-from datetime import timedelta
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
@@ -87,6 +86,27 @@ class Country(models.Model):
         return self.name
 
 
+class StoredImage(models.Model):
+    class Meta:
+        verbose_name = _(u'Файл картинки')
+        verbose_name_plural = _(u'Файлы картинок')
+        db_table = "d_stored_image"
+        index_together = [
+            ('refcount', 'last_used'),
+        ]
+
+    # sha256 of the uploaded bytes and of the sizes and formats they were processed into
+    key = models.CharField(max_length=64, unique=True)
+    url = models.CharField(max_length=255)
+    renditions = models.TextField(null=True, blank=True)
+    # pictures using the files, unused files are removed by remove_unused_images
+    refcount = models.IntegerField(default=0)
+    last_used = models.DateTimeField(default=timezone.now)
+
+    def __unicode__(self):
+        return "Stored image " + self.key
+
+
 class Picture(models.Model):
     class Meta:
         verbose_name = _(u'Картинка')
@@ -97,8 +117,19 @@ class Picture(models.Model):
     uid = models.CharField(max_length=100, unique=True, verbose_name=u'Уникальный идентификатор')
     url = models.CharField(max_length=255, verbose_name=u'Адрес картинки')
     preview_url = models.CharField(max_length=255, verbose_name=u'Адрес превью', null=True, blank=True)
+    # JSON list of the sizes and formats the image is saved in, see image_helper.RENDITIONS
+    renditions = models.TextField(verbose_name=u'Размеры картинки', null=True, blank=True)
+    image = models.ForeignKey(StoredImage, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    preview_image = models.ForeignKey(StoredImage, null=True, blank=True, related_name='+',
+                                      on_delete=models.SET_NULL)
     date_uploaded = models.DateTimeField(default=timezone.now, verbose_name=u'Дата загрузки')
 
+    @staticmethod
+    def release_handler(sender, **kwargs):
+        from decider_api.db.stored_images import release_images
+        picture = kwargs.get('instance')
+        release_images([picture.image_id, picture.preview_image_id])
+
 
 class User(AbstractBaseUser, PermissionsMixin):
 
@@ -182,6 +213,16 @@ class Question(models.Model):
         verbose_name_plural = _(u'Вопросы')
         ordering = ('-creation_date', )
         db_table = "d_question"
+        index_together = [
+            ('is_active', 'popularity', 'id'),
+            ('is_active', 'creation_date', 'id'),
+            ('is_active', 'category', 'creation_date', 'id'),
+            ('author', 'creation_date', 'id'),
+        ]
+
+    STATUSES = (('processing', 'processing'),
+                ('ready', 'ready'),
+                ('failed', 'failed'))
 
     text = models.TextField(_(u'Текст вопроса'), max_length=500, blank=True, default='')
     is_closed = models.BooleanField(_(u'Закрыт?'), default=False)
@@ -195,19 +236,90 @@ class Question(models.Model):
 
     comments_count = models.IntegerField(_(u'Количество комментов'), default=0)
     likes_count = models.IntegerField(_(u'Количество лайков'), default=0)
+    popularity = models.IntegerField(_(u'Популярность'), default=0)
 
     is_active = models.BooleanField(default=True)
     spam_count = models.PositiveIntegerField(default=0)
+    # a question stays inactive while the images of its poll are processed
+    status = models.CharField(max_length=20, choices=STATUSES, default='ready')
 
     def __unicode__(self):
         return "Question #" + str(self.id) + " by " + self.author.uid
 
 
+class QuestionHotScore(models.Model):
+    class Meta:
+        verbose_name = _(u'Рейтинг вопроса')
+        verbose_name_plural = _(u'Рейтинги вопросов')
+        db_table = "d_question_hot_score"
+        index_together = [
+            ('score', 'question'),
+        ]
+
+    question = models.OneToOneField(Question, primary_key=True, on_delete=models.CASCADE)
+    score = models.FloatField(_(u'Рейтинг'), default=0)
+    date_updated = models.DateTimeField(_(u'Дата пересчёта'), default=timezone.now)
+
+    def __unicode__(self):
+        return "Hot score for question #" + str(self.question_id)
+
+
+class FeedEntry(models.Model):
+    class Meta:
+        verbose_name = _(u'Запись ленты')
+        verbose_name_plural = _(u'Записи ленты')
+        db_table = "d_feed_entry"
+        index_together = [
+            ('creation_date', 'question'),
+            ('popularity', 'question'),
+            ('category', 'creation_date', 'question'),
+        ]
+
+    question = models.OneToOneField(Question, primary_key=True, on_delete=models.CASCADE,
+                                    related_name='feed_entry')
+    text = models.TextField(_(u'Текст вопроса'), blank=True, default='')
+    creation_date = models.DateTimeField(_(u'Дата создания'), default=timezone.now)
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL)
+    is_anonymous = models.BooleanField(_(u'Анонимен?'), default=False)
+
+    author = models.ForeignKey(User, on_delete=models.CASCADE)
+    author_first_name = models.CharField(max_length=50, blank=True, default='')
+    author_last_name = models.CharField(max_length=50, blank=True, default='')
+    author_middle_name = models.CharField(max_length=50, blank=True, default='')
+    author_username = models.CharField(max_length=50, blank=True, default='')
+    author_uid = models.CharField(max_length=50, blank=True, default='')
+    author_image_url = models.CharField(max_length=255, null=True, blank=True)
+    author_anonymous = models.BooleanField(default=False)
+
+    poll_id = models.IntegerField(null=True, blank=True)
+    poll_items = models.TextField(_(u'Варианты голосовалки'), null=True, blank=True)
+
+    likes_count = models.IntegerField(_(u'Количество лайков'), default=0)
+    comments_count = models.IntegerField(_(u'Количество комментов'), default=0)
+    popularity = models.IntegerField(_(u'Популярность'), default=0)
+
+    def __unicode__(self):
+        return "Feed entry for question #" + str(self.question_id)
+
+    @staticmethod
+    def refresh_handler(sender, **kwargs):
+        from decider_api.db.feed_entries import refresh_feed_entries
+        if kwargs.get('raw'):
+            return
+
+        instance = kwargs.get('instance')
+        refresh_feed_entries([instance.id if sender is Question else instance.question_id])
+
+
 class Comment(models.Model):
     class Meta:
         verbose_name = _(u'Комментарий')
         verbose_name_plural = _(u'Комментарии')
         db_table = "d_comment"
+        index_together = [
+            ('question', 'is_active', 'creation_date', 'id'),
+            ('question', 'is_active', 'id'),
+        ]
 
     text = models.TextField(_(u'Текст комментария'), max_length=1000, blank=True, default='')
     creation_date = models.DateTimeField(_(u'Дата создания'), default=timezone.now)
@@ -226,27 +338,17 @@ class Comment(models.Model):
 
     @staticmethod
     def comment_handler(sender, **kwargs):
-        from push_service.models import NotificationHistory
-        from push_service.tasks.comment_notification import comment_notification
-        comment = kwargs.get('instance')
-        question = comment.question
-        user = question.author
-        new_comment_history = NotificationHistory.objects.filter(user_id=user.id, entity='comment', action='new')
-        recent_history = NotificationHistory.objects.filter(user_id=user.id,
-                                                            date_created__gt=timezone.now() - timedelta(minutes=30))
-
-        if not new_comment_history and user != comment.author:
-            if not recent_history:
-                comment_notification.apply_async((user.id, question.id, comment.id),)
-            else:
-                comment_notification.apply_async((user.id, question.id, comment.id),
-                                                 eta=timezone.now() + timedelta(minutes=30))
+        if kwargs.get('created'):
+            comment = kwargs.get('instance')
+            NotificationEvent.objects.create(kind='comment', entity_id=comment.id, actor_id=comment.author_id)
+
 
 class CommentLike(models.Model):
     class Meta:
         verbose_name = _(u'Лайк комментария')
         verbose_name_plural = _(u'Лайки комментариев')
         db_table = "d_comment_likes"
+        unique_together = ('user', 'comment')
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
@@ -257,24 +359,10 @@ class CommentLike(models.Model):
 
     @staticmethod
     def comment_like_handler(sender, **kwargs):
-        from push_service.models import NotificationHistory
-        from push_service.tasks.comment_notification import comment_like_notification
-
-        comment_like = kwargs.get('instance')
-        liker = comment_like.user
-        comment = comment_like.comment
-        author = comment.author
-        question = comment.question
-        comment_like_history = NotificationHistory.objects.filter(user_id=author.id, entity='comment', action='like')
-        recent_history = NotificationHistory.objects.filter(user_id=author.id,
-                                                            date_created__gt=timezone.now() - timedelta(minutes=30))
-
-        if not comment_like_history and liker != author:
-            if not recent_history:
-                comment_like_notification.apply_async((author.id, question.id, comment.id),)
-            else:
-                comment_like_notification.apply_async((author.id, question.id, comment.id),
-                                                        eta=timezone.now() + timedelta(minutes=30))
+        if kwargs.get('created'):
+            comment_like = kwargs.get('instance')
+            NotificationEvent.objects.create(kind='comment_like', entity_id=comment_like.comment_id,
+                                             actor_id=comment_like.user_id)
 
 
 class Poll(models.Model):
@@ -325,24 +413,48 @@ class Vote(models.Model):
 
     @staticmethod
     def vote_handler(sender, **kwargs):
-        from push_service.models import NotificationHistory
-        from push_service.tasks.vote_notification import vote_notification
+        if kwargs.get('created'):
+            vote = kwargs.get('instance')
+            NotificationEvent.objects.create(kind='vote', entity_id=vote.poll_id, actor_id=vote.user_id)
+
+
+class CounterDelta(models.Model):
+    class Meta:
+        verbose_name = _(u'Изменение счётчика')
+        verbose_name_plural = _(u'Изменения счётчиков')
+        db_table = "d_counter_delta"
+        index_together = [
+            ('entity', 'entity_id', 'field'),
+        ]
+
+    entity = models.CharField(max_length=20)
+    entity_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=30)
+    delta = models.IntegerField(default=0)
+    creation_date = models.DateTimeField(_(u'Дата создания'), default=timezone.now)
+
+    def __unicode__(self):
+        return "Delta of " + self.field + " for " + self.entity + " #" + str(self.entity_id)
 
-        vote = kwargs.get('instance')
-        voter = vote.user
-        question = vote.poll.question
-        author = question.author
 
-        vote_history = NotificationHistory.objects.filter(user_id=author.id, entity='question', action='vote')
-        recent_history = NotificationHistory.objects.filter(user_id=author.id,
-                                                            date_created__gt=timezone.now() - timedelta(minutes=30))
+class NotificationEvent(models.Model):
+    class Meta:
+        verbose_name = _(u'Событие для уведомления')
+        verbose_name_plural = _(u'События для уведомлений')
+        db_table = "d_notification_event"
 
-        if not vote_history and voter != author:
-            if not recent_history:
-                vote_notification.apply_async((author.id, question.id),)
-            else:
-                vote_notification.apply_async((author.id, question.id),
-                                              eta=timezone.now() + timedelta(minutes=30))
+    KINDS = (('comment', 'comment'),
+             ('comment_like', 'comment_like'),
+             ('vote', 'vote'))
+
+    # the comment for comments and comment likes, the poll for votes
+    kind = models.CharField(max_length=20, choices=KINDS)
+    entity_id = models.PositiveIntegerField()
+    actor_id = models.PositiveIntegerField()
+    creation_date = models.DateTimeField(_(u'Дата создания'), default=timezone.now)
+
+    def __unicode__(self):
+        return "Event " + self.kind + " for #" + str(self.entity_id)
 
 
 class Locale(models.Model):
@@ -390,3 +502,7 @@ class SpamReport(models.Model):
 post_save.connect(Comment.comment_handler, sender=Comment)
 post_save.connect(CommentLike.comment_like_handler, sender=CommentLike)
 post_save.connect(Vote.vote_handler, sender=Vote)
+post_save.connect(FeedEntry.refresh_handler, sender=Question)
+post_save.connect(FeedEntry.refresh_handler, sender=Poll)
+post_save.connect(FeedEntry.refresh_handler, sender=PollItem)
+post_delete.connect(Picture.release_handler, sender=Picture)
@@ -35,3 +35,4 @@ I_CODE_VOTE_OK = 10000
 I_CODE_ALREADY_VOTED = 10001
 I_CODE_UNKNOWN_ENTITY = 10002
 I_CODE_NO_MATCH = 10003
+I_CODE_UNKNOWN_QUESTION = 10004
@@ -113,6 +113,26 @@ DATABASES = {
     }
 }
 
+# Cache
+# the feed and comment caches are invalidated from every web worker and celery task, so caching
+# is only on with a backend all processes share (memcached, redis), per process backends are ignored
+
+CACHE_BACKEND = 'django.core.cache.backends.dummy.DummyCache'
+CACHE_LOCATION = 'decider'
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+CACHE_SHARED = (get_config_opt(config, 'cache', 'BACKEND', CACHE_BACKEND) or CACHE_BACKEND) not in LOCAL_CACHE_BACKENDS
+
+CACHES = {
+    'default': {
+        'BACKEND': get_config_opt(config, 'cache', 'BACKEND') if CACHE_SHARED else CACHE_BACKEND,
+        'LOCATION': get_config_opt(config, 'cache', 'LOCATION', CACHE_LOCATION) or CACHE_LOCATION,
+    }
+}
+
 AUTH_USER_MODEL = 'decider_app.User'
 # Internationalization
 # https://docs.djangoproject.com/en/1.7/topics/i18n/
@@ -292,4 +312,37 @@ RABBITMQ_HOST = get_config_opt(config, 'celery', 'RABBITMQ_HOST')
 RABBITMQ_PORT = get_config_opt(config, 'celery', 'RABBITMQ_PORT')
 RABBITMQ_VHOST = get_config_opt(config, 'celery', 'RABBITMQ_VHOST')
 
+# fetch feed poll items with the questions query (json_agg) instead of a second query
+FEED_AGGREGATE_POLL_ITEMS = str2bool(get_config_opt(config, 'common', 'FEED_AGGREGATE_POLL_ITEMS', 'True'))
+
+# serve the new and popular tabs from the denormalized d_feed_entry table
+FEED_READ_MODEL = str2bool(get_config_opt(config, 'common', 'FEED_READ_MODEL', 'True'))
+
+# feed pages computed ahead of the client's scroll position, per request
+# they are handed over through the cache, so there is no prefetch without a shared one
+FEED_PREFETCH_PAGES = int(get_config_opt(config, 'common', 'FEED_PREFETCH_PAGES', '2')) if CACHE_SHARED else 0
+FEED_PREFETCH_WORKERS = int(get_config_opt(config, 'common', 'FEED_PREFETCH_WORKERS', '4'))
+
+# append counter increments to d_counter_delta and fold them in a periodic task
+# instead of updating the hot question and poll item rows on every like and vote
+COUNTERS_BUFFERED = str2bool(get_config_opt(config, 'common', 'COUNTERS_BUFFERED', 'False'))
+
+# serve live question events, off by default: the broker is in-process, so only requests served
+# by the process that made the change see it, and every waiting client holds a worker
+EVENTS_ENABLED = str2bool(get_config_opt(config, 'common', 'EVENTS_ENABLED', 'False'))
+
+# seconds a question events request is held, long-poll and server-sent events
+EVENTS_POLL_TIMEOUT = int(get_config_opt(config, 'common', 'EVENTS_POLL_TIMEOUT', '25'))
+EVENTS_STREAM_TIMEOUT = int(get_config_opt(config, 'common', 'EVENTS_STREAM_TIMEOUT', '55'))
+
+# resize the poll images of new questions in a celery worker, the question goes live once they are done
+IMAGES_ASYNC = str2bool(get_config_opt(config, 'common', 'IMAGES_ASYNC', 'True'))
+
+# resize all images of an upload at once in a pool of IMAGE_WORKERS threads per process
+IMAGES_CONCURRENT = str2bool(get_config_opt(config, 'common', 'IMAGES_CONCURRENT', 'True'))
+IMAGE_WORKERS = int(get_config_opt(config, 'common', 'IMAGE_WORKERS', '4'))
+
+# save the poll image renditions as WebP next to the JPEGs
+IMAGES_WEBP = str2bool(get_config_opt(config, 'common', 'IMAGES_WEBP', 'False'))
+
 TEMP_URLS = DEBUG or str2bool(get_config_opt(config, 'common', 'TEMP_URLS', 'True'))
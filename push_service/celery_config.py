@@ -19,12 +19,35 @@ CELERY_TASK_TIME_LIMIT = 20
 CELERY_TASK_SOFT_TIME_LIMIT = 10
 
 CELERY_IMPORTS = ('decider_api.views.question_views', 'push_service.tasks.comment_notification',
-                  'push_service.tasks.vote_notification', 'push_service.tasks.periodic_tasks')
+                  'push_service.tasks.vote_notification', 'push_service.tasks.periodic_tasks',
+                  'push_service.tasks.ranking_tasks', 'push_service.tasks.feed_tasks',
+                  'push_service.tasks.counter_tasks', 'push_service.tasks.outbox_tasks',
+                  'push_service.tasks.image_tasks')
 # CELERY_TIMEZONE = 'Europe/Moscow'
 
 CELERYBEAT_SCHEDULE = {
     'many': {
         'task': 'push_service.tasks.periodic_tasks.send_periodic_notifications',
         'schedule': timedelta(hours=6)
+    },
+    'hot': {
+        'task': 'push_service.tasks.ranking_tasks.update_hot_ranking',
+        'schedule': timedelta(minutes=10)
+    },
+    'feed': {
+        'task': 'push_service.tasks.feed_tasks.rebuild_feed_entries',
+        'schedule': timedelta(hours=1)
+    },
+    'counters': {
+        'task': 'push_service.tasks.counter_tasks.fold_counter_deltas',
+        'schedule': timedelta(seconds=10)
+    },
+    'notifications': {
+        'task': 'push_service.tasks.outbox_tasks.send_notification_events',
+        'schedule': timedelta(seconds=5)
+    },
+    'images': {
+        'task': 'push_service.tasks.image_tasks.clean_stored_images',
+        'schedule': timedelta(hours=1)
     }
 }
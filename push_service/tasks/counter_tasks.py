@@ -0,0 +1,26 @@
+from django.db import transaction
+from decider_api.db.counters import fold_deltas
+from decider_api.db.feed_entries import refresh_feed_counters
+from decider_api.utils import cache_helper
+from push_service.app import app
+
+FOLD_BATCH_SIZE = 10000
+
+
+@app.task()
+def fold_counter_deltas():
+    from decider_app.models import Comment
+
+    with transaction.atomic():
+        folded = fold_deltas(FOLD_BATCH_SIZE)
+
+        # poll item votes come with a question popularity delta, so their questions are listed too
+        q_ids = sorted(folded.get('question', []))
+        refresh_feed_counters(q_ids, poll_items=bool(folded.get('poll_item')), folded=True)
+
+    cache_helper.invalidate_questions(q_ids)
+    if folded.get('comment'):
+        comment_q_ids = Comment.objects.filter(id__in=folded['comment']).values_list('question_id', flat=True)
+        for q_id in set(comment_q_ids):
+            if q_id:
+                cache_helper.invalidate_comments(q_id)
@@ -0,0 +1,19 @@
+from django.db import transaction
+from decider_api.db.feed_entries import refresh_feed_entries
+from push_service.app import app
+
+FEED_BATCH_SIZE = 500
+
+
+# entries are kept current by the write paths, this pass repairs anything written around them
+@app.task(soft_time_limit=240, time_limit=300)
+def rebuild_feed_entries():
+    from decider_app.models import Question, FeedEntry
+
+    q_ids = set(Question.objects.filter(is_active=True).values_list('id', flat=True))
+    q_ids.update(FeedEntry.objects.values_list('question_id', flat=True))
+    q_ids = sorted(q_ids)
+
+    for i in range(0, len(q_ids), FEED_BATCH_SIZE):
+        with transaction.atomic():
+            refresh_feed_entries(q_ids[i:i + FEED_BATCH_SIZE])
@@ -0,0 +1,74 @@
+import json
+import os
+from django.db import transaction
+from decider_api.db.feed_entries import refresh_feed_entries
+from decider_api.db.stored_images import remove_unused_images
+from decider_api.log_manager import logger
+from decider_api.utils import cache_helper
+from decider_api.utils.image_helper import upload_images, remove_staged, create_picture
+from decider_backend.settings import MEDIA_ROOT
+from push_service.app import app
+
+# stored images unused for this long are removed, long enough for an upload to reference what it found
+UNUSED_GRACE = 3600
+CLEANUP_BATCH_SIZE = 500
+
+
+@app.task(soft_time_limit=50, time_limit=60)
+def process_question_images(question_id, items):
+    """
+    Resizes and encodes the staged images of a question's poll items, given as
+    [(poll_item_id, image_path, preview_path)], and activates the question once
+    all of them are in place. A bad image marks the question as failed.
+    """
+    from decider_app.models import Question, PollItem
+    from decider_api.views.question_views import create_share_image
+
+    try:
+        results = upload_images([(os.path.join(MEDIA_ROOT, image_path), os.path.join(MEDIA_ROOT, preview_path))
+                                 for pi_id, image_path, preview_path in items], 'polls', renditions=True)
+        if not any(result.get('error') for result in results):
+            results = [(pi_id, result['data']) for (pi_id, image_path, preview_path), result in zip(items, results)]
+            with transaction.atomic():
+                for pi_id, data in results:
+                    picture = create_picture(data)
+                    PollItem.objects.filter(id=pi_id).update(picture=picture)
+                # the question takes comments, likes and votes while it is processed, a save of
+                # the row read here would put its counters back
+                Question.objects.filter(id=question_id).update(status='ready', is_active=True)
+                refresh_feed_entries([question_id])
+
+            cache_helper.invalidate_question(question_id)
+            cache_helper.invalidate_feed()
+            create_share_image.delay(question_id=question_id)
+            return
+    except Exception as e:
+        logger.exception(e)
+    finally:
+        for pi_id, image_path, preview_path in items:
+            remove_staged(image_path)
+            remove_staged(preview_path)
+
+    Question.objects.filter(id=question_id).update(status='failed')
+    cache_helper.invalidate_question(question_id)
+
+
+@app.task(soft_time_limit=240, time_limit=300)
+def clean_stored_images():
+    """
+    Removes the stored images no picture references any more, with their files.
+    """
+    while True:
+        with transaction.atomic():
+            removed = remove_unused_images(UNUSED_GRACE, CLEANUP_BATCH_SIZE)
+            # the files go while the deleted rows are still locked: an upload of the same bytes
+            # waits in find_images until the commit and writes its files after this, not before
+            for url, renditions in removed:
+                paths = set([url] + [rendition['url'] for rendition in json.loads(renditions or '[]')])
+                for path in paths:
+                    try:
+                        os.remove(os.path.join(MEDIA_ROOT, path))
+                    except OSError as e:
+                        logger.warning("Failed to remove stored image " + path + ": " + str(e))
+        if len(removed) < CLEANUP_BATCH_SIZE:
+            return
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from decider_api.log_manager import logger
+from decider_api.db.notification_events import drain_events
+from push_service.app import app
+from push_service.tasks.comment_notification import comment_notification, comment_like_notification
+from push_service.tasks.vote_notification import vote_notification
+
+OUTBOX_BATCH_SIZE = 1000
+
+# the notification history that stops a second notification of the same kind
+HISTORY_KINDS = {
+    'comment': ('comment', 'new'),
+    'comment_like': ('comment', 'like'),
+    'vote': ('question', 'vote'),
+}
+
+
+def get_task(event):
+    if event['kind'] == 'comment':
+        return comment_notification, (event['recipient_id'], event['question_id'], event['comment_id'])
+    elif event['kind'] == 'comment_like':
+        return comment_like_notification, (event['recipient_id'], event['question_id'], event['comment_id'])
+    return vote_notification, (event['recipient_id'], event['question_id'])
+
+
+@app.task()
+def send_notification_events():
+    """
+    Drains the notification outbox the comment, comment like and vote handlers write to
+    and schedules the notifications, with the history of all recipients read at once.
+    """
+    from push_service.models import NotificationHistory
+
+    # delivery is at most once: the drain commits before anything is published, a notification
+    # lost to a failed publish is better than the whole batch going out again on the next run
+    with transaction.atomic():
+        events = [event for event in drain_events(OUTBOX_BATCH_SIZE)
+                  if event['recipient_id'] and event['recipient_id'] != event['actor_id']]
+    if not events:
+        return
+
+    recipients = set(event['recipient_id'] for event in events)
+    sent = set()
+    recent = set()
+    recent_date = timezone.now() - timedelta(minutes=30)
+    for user_id, entity, action, date_created in NotificationHistory.objects \
+            .filter(user_id__in=recipients).values_list('user_id', 'entity', 'action', 'date_created'):
+        sent.add((user_id, entity, action))
+        if date_created > recent_date:
+            recent.add(user_id)
+
+    scheduled = set()
+    for event in events:
+        if (event['recipient_id'],) + HISTORY_KINDS[event['kind']] in sent:
+            continue
+        task, args = get_task(event)
+        # repeated events of a batch make one notification
+        if (task.name, args) in scheduled:
+            continue
+        scheduled.add((task.name, args))
+
+        try:
+            if event['recipient_id'] not in recent:
+                task.apply_async(args)
+            else:
+                task.apply_async(args, eta=timezone.now() + timedelta(minutes=30))
+        except Exception as e:
+            logger.exception(e)
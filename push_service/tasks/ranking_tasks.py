@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from decider_api.db.ranking import update_hot_scores
+from push_service.app import app
+
+HOT_HALF_LIFE = 12      # hours
+HOT_WINDOW = 14         # days
+HOT_BATCH_SIZE = 500
+
+
+# the whole window is rescored, so allow more than the default task time limit
+@app.task(soft_time_limit=240, time_limit=300)
+def update_hot_ranking():
+    from decider_app.models import Question, QuestionHotScore
+    since = timezone.now() - timedelta(days=HOT_WINDOW)
+
+    QuestionHotScore.objects.exclude(question__is_active=True, question__creation_date__gte=since).delete()
+
+    q_ids = list(Question.objects.filter(is_active=True, creation_date__gte=since)
+                                 .order_by('id')
+                                 .values_list('id', flat=True))
+
+    for i in range(0, len(q_ids), HOT_BATCH_SIZE):
+        with transaction.atomic():
+            update_hot_scores(q_ids[i:i + HOT_BATCH_SIZE], HOT_HALF_LIFE * 3600)